@@ -0,0 +1,134 @@
+from __future__ import annotations # for type hints
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # no window, so it runs the same on a build machine
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import sys
+import time
+import json
+import argparse
+import platform
+import datetime
+import subprocess
+
+from classes import User, Player, Camera, Hitbox, Vector, Inputs, LevelSnapshot, TileCache, calc_percentiles
+import pygame
+from maps import get_maps, load_map, clear_records
+import main as game
+
+def calc_stats(samples: list[float]) -> dict:
+	# samples in seconds, results in microseconds
+	if len(samples) == 0:
+		return {"count": 0}
+	p50, p90, p99, p100 = calc_percentiles(samples, [50, 90, 99, 100])
+	return {
+		"count": len(samples),
+		"mean_us": sum(samples) / len(samples) * 1e6,
+		"p50_us": p50 * 1e6,
+		"p90_us": p90 * 1e6,
+		"p99_us": p99 * 1e6,
+		"max_us": p100 * 1e6,
+		"total_s": sum(samples),
+	}
+
+def get_script_inputs(tick: int) -> Inputs:
+	# the same inputs every run: run right jumping, slide, double back, repeat
+	step = tick % 480
+	if step < 180:
+		return Inputs(walk_right=True, jump=step % 60 < 20)
+	elif step < 240:
+		return Inputs(walk_right=True, slide=True, jump=step % 60 > 40)
+	elif step < 360:
+		return Inputs(walk_left=True, jump=step % 40 < 10)
+	return Inputs(walk_right=True, jump=step % 30 < 15)
+
+def bench_load(map: int, repeats: int) -> dict:
+	# cold reads and unpacks walls.bin every time, warm builds the walls from the records already in memory
+	cold = []
+	warm = []
+	for i in range(repeats):
+		clear_records(map)
+		start = time.perf_counter()
+		load_map(map)
+		cold.append(time.perf_counter() - start)
+		start = time.perf_counter()
+		load_map(map)
+		warm.append(time.perf_counter() - start)
+	return {"cold": calc_stats(cold), "warm": calc_stats(warm)}
+
+def bench_map(map: int, ticks: int, draw_every: int, win: pygame.Surface, font: pygame.font, tick: float) -> dict:
+	walls, checkpoints, wall_grid = load_map(map)
+	user = User()
+	player = Player(user)
+	camera = Camera()
+	snapshot = LevelSnapshot(checkpoints, camera)
+	tile_cache = TileCache(wall_grid, checkpoints, win.get_width())
+	hb_mouse = Hitbox(Vector(0, 0), 10, 10, "#ff00ff")
+	physics = []
+	draws = []
+	resets = 0
+	for i in range(ticks):
+		keys_down = get_script_inputs(i).to_keys(user)
+		start = time.perf_counter()
+		player.save_prev_pt()
+		camera.save_prev_vert_offset()
+		player.handle_keys(keys_down, hb_mouse, tick, wall_grid, checkpoints, camera)
+		physics.append(time.perf_counter() - start)
+		if draw_every > 0 and i % draw_every == 0:
+			start = time.perf_counter()
+			game.draw_game(win, font, player, tile_cache, camera, hb_mouse, tick * draw_every, datetime.timedelta(seconds=i * tick))
+			draws.append(time.perf_counter() - start)
+		if not player.get_is_alive() or player.get_is_finished():
+			player = Player(user)
+			camera = Camera()
+			snapshot.restore(camera)
+			resets += 1
+	return {"walls": len(walls), "teleporters": len(checkpoints), "resets": resets, "physics": calc_stats(physics), "draw": calc_stats(draws)}
+
+def get_commit() -> str:
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True).stdout.strip()
+	except OSError:
+		return ""
+
+def main():
+	parser = argparse.ArgumentParser(description="time map loading, physics and drawing on every map")
+	parser.add_argument("--ticks", type=int, default=3000, help="physics ticks per map")
+	parser.add_argument("--draw-every", type=int, default=2, help="draw_game once every this many ticks, 0 to skip drawing")
+	parser.add_argument("--loads", type=int, default=20, help="times to load each map")
+	parser.add_argument("--maps", default="", help="comma separated map ids, all of them by default")
+	parser.add_argument("--out", default="", help="write the json here instead of printing it")
+	args = parser.parse_args()
+
+	pygame.init()
+	# create_window asks for fullscreen and cursors, which the dummy driver can't do
+	win = pygame.display.set_mode((1920, 1080))
+	fonts = game.create_fonts()
+	tick = 1 / game.TICK_RATE
+	maps = [int(map) for map in args.maps.split(",")] if args.maps != "" else list(get_maps())
+
+	results = {
+		"commit": get_commit(),
+		"date": datetime.datetime.now().isoformat(timespec="seconds"),
+		"python": platform.python_version(),
+		"pygame": pygame.version.ver,
+		"ticks": args.ticks,
+		"draw_every": args.draw_every,
+		"maps": {},
+	}
+	for map in maps:
+		start = time.perf_counter()
+		results["maps"][str(map)] = {"name": get_maps()[map].get_name(), "load": bench_load(map, args.loads)}
+		results["maps"][str(map)].update(bench_map(map, args.ticks, args.draw_every, win, fonts[1], tick))
+		print("%d %s: %.2fs" % (map, get_maps()[map].get_name(), time.perf_counter() - start), file=sys.stderr)
+	pygame.quit()
+
+	text = json.dumps(results, indent=2)
+	if args.out != "":
+		f = open(args.out, "w")
+		f.write(text + "\n")
+		f.close()
+	else:
+		print(text)
+
+if __name__ == "__main__":
+	main()
@@ -1,8 +1,31 @@
 from __future__ import annotations # for type hints
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # every module gets pygame through here or after it
 import pygame # graphics library
 from pygame.locals import * # for keyboard input (ex: 'K_w')
 import math
-import copy
+import time
+from collections import OrderedDict, deque
+from array import array
+try:
+	import numpy as np # optional, only used to check big areas of the level in one call
+except ImportError:
+	np = None
+
+# what kind of wall a Surface is, as bit flags
+KIND_KILL = 1
+KIND_FINISH = 2
+KIND_TELEPORT = 4
+KIND_ICE = 8
+
+# what an Inputs is holding, as bit flags for replays
+INPUT_WALK_LEFT = 1
+INPUT_WALK_RIGHT = 2
+INPUT_JUMP = 4
+INPUT_SLIDE = 8
+INPUT_FLY = 16
+
+MAX_STEPS = 64 # most pieces Player.update cuts one tick's move into
 
 class User():
 	def __init__(self, walk_left = K_a, walk_right = K_d, jump = K_SPACE, slide = K_LCTRL, music_on = True):
@@ -26,6 +49,46 @@ class User():
 			self.music_on = val
 		self.settings = [self.walk_left, self.walk_right, self.jump, self.slide, self.music_on]
 
+class Inputs(): # inp
+	# what the player is holding for one physics step, so the physics doesn't need pygame's key array
+	def __init__(self, walk_left: bool = False, walk_right: bool = False, jump: bool = False, slide: bool = False, fly: bool = False):
+		self.walk_left = walk_left
+		self.walk_right = walk_right
+		self.jump = jump
+		self.slide = slide
+		self.fly = fly # toggles fly mode off again (debug)
+
+	@staticmethod
+	def from_keys(keys_down: list[bool], user: User) -> Inputs:
+		return Inputs(bool(keys_down[user.walk_left]), bool(keys_down[user.walk_right]), bool(keys_down[user.jump]), bool(keys_down[user.slide]), bool(keys_down[K_p]))
+
+	@staticmethod
+	def from_bits(bits: int) -> Inputs:
+		return Inputs(bool(bits & INPUT_WALK_LEFT), bool(bits & INPUT_WALK_RIGHT), bool(bits & INPUT_JUMP), bool(bits & INPUT_SLIDE), bool(bits & INPUT_FLY))
+
+	def to_bits(self) -> int:
+		bits = 0
+		if self.walk_left:
+			bits |= INPUT_WALK_LEFT
+		if self.walk_right:
+			bits |= INPUT_WALK_RIGHT
+		if self.jump:
+			bits |= INPUT_JUMP
+		if self.slide:
+			bits |= INPUT_SLIDE
+		if self.fly:
+			bits |= INPUT_FLY
+		return bits
+
+	def to_keys(self, user: User) -> dict[int, bool]:
+		# something from_keys can read back, for feeding recorded inputs through Player.handle_keys
+		keys_down = {K_p: self.fly}
+		keys_down[user.walk_left] = self.walk_left
+		keys_down[user.walk_right] = self.walk_right
+		keys_down[user.jump] = self.jump
+		keys_down[user.slide] = self.slide
+		return keys_down
+
 class DownPress():
 	def __init__(self):
 		self.was_down = False
@@ -38,7 +101,99 @@ class DownPress():
 			self.was_down = False
 		return False
 
+class InputBuffer(): # ib
+	# KEYDOWN and KEYUP events kept in the order they arrived and handed out one physics tick at a time
+	# pygame doesn't say when a key event happened, so a frame's events go to its first tick unless they would undo an edge on it
+	def __init__(self, user: User, buffers: dict[str, float] = None):
+		self._user: User = user
+		self._events: deque = deque() # (key, is_down) not given to a tick yet
+		self._held: set[int] = set()
+		self._pressed: set[int] = set() # went down on the last tick
+		self._released: set[int] = set() # went up on the last tick
+		self._buffers: dict[str, float] = dict(buffers) if buffers is not None else {} # action: seconds a press of it stays on after the key is let go
+		self._buffered: dict[str, float] = {} # action: seconds of its window left
+
+	def get_user(self) -> User:
+		return self._user
+	def set_user(self, user: User) -> None:
+		self._user = user
+	def get_buffer(self, action: str) -> float:
+		return self._buffers.get(action, 0)
+	def set_buffer(self, action: str, seconds: float) -> None:
+		self._buffers[action] = seconds
+	def get_is_held(self, key: int) -> bool:
+		return key in self._held
+	def get_is_pressed(self, key: int) -> bool:
+		return key in self._pressed
+	def get_is_released(self, key: int) -> bool:
+		return key in self._released
+	def get_is_buffered(self, action: str) -> bool:
+		return action in self._buffered
+
+	def get_action_key(self, action: str) -> int:
+		# looked up every time so a key rebound in the settings works straight away
+		if action == "fly":
+			return K_p
+		return getattr(self._user, action)
+
+	def handle_event(self, event: pygame.event.Event) -> bool:
+		# returns whether the event was a key
+		if event.type == KEYDOWN:
+			self._events.append((event.key, True))
+			return True
+		if event.type == KEYUP:
+			self._events.append((event.key, False))
+			return True
+		return False
+
+	def apply(self, event: tuple) -> None:
+		key, is_down = event
+		if is_down and key not in self._held:
+			self._held.add(key)
+			self._pressed.add(key)
+		elif not is_down and key in self._held:
+			self._held.discard(key)
+			self._released.add(key)
+
+	def next_tick(self, delta: float) -> Inputs:
+		# a key that goes down and up again before a tick still counts as held for one tick, the up waits for the next one
+		self._pressed = set()
+		self._released = set()
+		for action in list(self._buffered):
+			self._buffered[action] -= delta
+			if self._buffered[action] <= 0:
+				del self._buffered[action]
+		while len(self._events) > 0:
+			key, is_down = self._events[0]
+			if (is_down and key in self._released) or (not is_down and key in self._pressed):
+				break
+			self.apply(self._events.popleft())
+		for action, seconds in self._buffers.items():
+			if seconds > 0 and self.get_is_pressed(self.get_action_key(action)):
+				self._buffered[action] = seconds
+		return self.get_inputs()
+
+	def get_inputs(self) -> Inputs:
+		inputs = Inputs()
+		for action in ["walk_left", "walk_right", "jump", "slide", "fly"]:
+			setattr(inputs, action, self.get_is_held(self.get_action_key(action)) or self.get_is_buffered(action))
+		return inputs
+
+	def consume(self, action: str) -> None:
+		# the press did what it was buffered for
+		self._buffered.pop(action, None)
+
+	def flush(self) -> None:
+		# catches up on the keys without making edges, for while no ticks are running
+		while len(self._events) > 0:
+			self.apply(self._events.popleft())
+		self._pressed = set()
+		self._released = set()
+		self._buffered = {}
+
 class Vector(): # vec
+	__slots__ = ("_x", "_y") # every wall has one, so no per-instance __dict__
+
 	def __init__(self, x: float, y: float):
 		self._x: float = x
 		self._y: float = y
@@ -95,6 +250,8 @@ class Vector(): # vec
 
 
 class Hitbox(): # hb
+	__slots__ = ("_pt", "_w", "_h", "_color")
+
 	def __init__(self, pt: Vector, w: float, h: float, color: str = "#ffffff"):
 		self._pt: Vector = pt
 		self._w: float = w
@@ -118,13 +275,16 @@ class Hitbox(): # hb
 		return self._h
 	def set_h(self, h: float) -> None:
 		self._h = h
-	def get_rect(self) -> pygame.Rect:
-		return pygame.Rect(self.get_pt().get_x(), self.get_pt().get_y(), self.get_w(), self.get_h())
+	def get_rect(self, vert_offset: float = 0) -> pygame.Rect:
+		return pygame.Rect(self.get_pt().get_x(), self.get_pt().get_y() - vert_offset, self.get_w(), self.get_h())
 	def get_color(self) -> str:
 		return self._color
 	def set_color(self, color: str) -> None:
 		self._color = color
 
+	def get_bounds(self) -> tuple[float, float, float, float]:
+		return (self.get_pt().get_x(), self.get_pt().get_y(), self.get_pt().get_x() + self.get_w(), self.get_pt().get_y() + self.get_h())
+
 	def check_collide(self, hb: Hitbox) -> bool:
 		return (
 			self.get_pt().get_x() < hb.get_pt().get_x() + hb.get_w()
@@ -133,11 +293,32 @@ class Hitbox(): # hb
 			and hb.get_pt().get_y() < self.get_pt().get_y() + self.get_h()
 		)
 
-	def draw(self, win: pygame.Surface) -> None:
-		pygame.draw.rect(win, self.get_color(), self.get_rect())
+	def calc_sweep(self, bounds: tuple[float, float, float, float], dx: float, dy: float) -> float:
+		# the fraction of (dx, dy) a box with these bounds moves before it overlaps this hitbox, -1 if it never does
+		x1, y1, x2, y2 = self.get_bounds()
+		t_enter = 0
+		t_exit = 1
+		for start, end, wall_start, wall_end, d in ((bounds[0], bounds[2], x1, x2, dx), (bounds[1], bounds[3], y1, y2, dy)):
+			if d == 0:
+				if not (start < wall_end and wall_start < end):
+					return -1
+			elif d > 0:
+				t_enter = max(t_enter, (wall_start - end) / d)
+				t_exit = min(t_exit, (wall_end - start) / d)
+			else:
+				t_enter = max(t_enter, (wall_end - start) / d)
+				t_exit = min(t_exit, (wall_start - end) / d)
+		if t_enter >= t_exit or t_enter >= 1:
+			return -1
+		return t_enter
+
+	def draw(self, win: pygame.Surface, vert_offset: float = 0) -> None:
+		pygame.draw.rect(win, self.get_color(), self.get_rect(vert_offset))
 
 
 class HitboxPart(Hitbox): # hbp
+	__slots__ = ("_vec_offset",)
+
 	def __init__(self, pt: Vector, vec_offset: Vector, w: float, h: float, color: str = "#ffffff"):
 		super().__init__(pt, w, h, color)
 		self._vec_offset: Vector = vec_offset
@@ -155,6 +336,8 @@ class HitboxPart(Hitbox): # hbp
 
 
 class AdvancedHitbox(Hitbox): # ahb
+	__slots__ = ("_hbps",)
+
 	def __init__(self, pt: Vector, w: float, h: float, color: str = "#ffffff"):
 		super().__init__(pt, w, h, color)
 		self._hbps: list[HitboxPart] = []
@@ -167,12 +350,57 @@ class AdvancedHitbox(Hitbox): # ahb
 	def add_hbp(self, hbp: HitboxPart) -> None:
 		self.get_hbps().append(hbp)
 
+	def get_bounds(self) -> tuple[float, float, float, float]:
+		if len(self.get_hbps()) == 0:
+			return super().get_bounds()
+		x1, y1, x2, y2 = self.get_hbps()[0].get_bounds()
+		for hbp in self.get_hbps()[1:]:
+			bounds = hbp.get_bounds()
+			x1, y1 = min(x1, bounds[0]), min(y1, bounds[1])
+			x2, y2 = max(x2, bounds[2]), max(y2, bounds[3])
+		return (x1, y1, x2, y2)
+
 	def check_collisions(self, hb: Hitbox) -> bool:
 		for hbp in self.get_hbps():
 			if hbp.check_collide(hb):
 				return True
 		return False
 
+	def get_hbp_probe_bounds(self, x: float, y: float, swapped: bool = False) -> list[tuple[float, float, float, float]]:
+		# bounds of each hbp if the master was at (x, y), with every hbp's w and h swapped if swapped
+		bounds = []
+		for hbp in self.get_hbps():
+			hbp_x = x + hbp.get_vec_offset().get_x()
+			hbp_y = y + hbp.get_vec_offset().get_y()
+			w, h = (hbp.get_h(), hbp.get_w()) if swapped else (hbp.get_w(), hbp.get_h())
+			bounds.append((hbp_x, hbp_y, hbp_x + w, hbp_y + h))
+		return bounds
+
+	def get_probe_bounds(self, x: float, y: float, swapped: bool = False) -> tuple[float, float, float, float]:
+		if len(self.get_hbps()) == 0:
+			return (x, y, x + self.get_w(), y + self.get_h())
+		hbp_bounds = self.get_hbp_probe_bounds(x, y, swapped)
+		x1, y1, x2, y2 = hbp_bounds[0]
+		for bounds in hbp_bounds[1:]:
+			x1, y1 = min(x1, bounds[0]), min(y1, bounds[1])
+			x2, y2 = max(x2, bounds[2]), max(y2, bounds[3])
+		return (x1, y1, x2, y2)
+
+	def check_probe_collisions(self, hb: Hitbox, x: float, y: float, swapped: bool = False) -> bool:
+		# same as moving a copy to (x, y) and calling update_hbps (and swapping w and h if swapped), without the copy
+		for hbp in self.get_hbps():
+			hbp_x = x + hbp.get_vec_offset().get_x()
+			hbp_y = y + hbp.get_vec_offset().get_y()
+			w, h = (hbp.get_h(), hbp.get_w()) if swapped else (hbp.get_w(), hbp.get_h())
+			if (
+				hbp_x < hb.get_pt().get_x() + hb.get_w()
+				and hb.get_pt().get_x() < hbp_x + w
+				and hbp_y < hb.get_pt().get_y() + hb.get_h()
+				and hb.get_pt().get_y() < hbp_y + h
+			):
+				return True
+		return False
+
 	def check_advanced_collisions(self, ahb: AdvancedHitbox) -> bool:
 		for hbp_self in self.get_hbps():
 			for hbp_other in ahb.get_hbps():
@@ -190,7 +418,7 @@ class AdvancedHitbox(Hitbox): # ahb
 	# 		hbp.draw(win)
 
 class Player(AdvancedHitbox): # p
-	def __init__(self, user):
+	def __init__(self, user, profiler: Profiler = None):
 		super().__init__(Vector(100, 760), 25, 40, "#00ff00")
 		self.add_hbp(HitboxPart(Vector(100, 760), Vector(0, 0), 25, 40))
 		# self.add_hbp(HitboxPart(Vector(150, 855), Vector(0, 10), 25, 25))
@@ -207,13 +435,27 @@ class Player(AdvancedHitbox): # p
 		self._can_double_jump = True
 		self._space_was_down = False # space bar was down
 		self._jumped_while_sliding = False
+		self._has_jumped = False # jumped on the last tick
 		self._can_fly = False
 		self._is_alive = True
 		self._is_finished = False
+		self._prev_pt: Vector = Vector(100, 760) # where the player was before the last physics tick
+		self._profiler: Profiler = profiler if profiler is not None else null_profiler # times the collision passes
 
 	def __str__(self) -> str:
 		return "Player: %s" % super().__str__()
 
+	def get_prev_pt(self) -> Vector:
+		return self._prev_pt
+	def get_profiler(self) -> Profiler:
+		return self._profiler
+	def set_profiler(self, profiler: Profiler) -> None:
+		self._profiler = profiler
+	def save_prev_pt(self) -> None:
+		self._prev_pt.set_x(self.get_pt().get_x())
+		self._prev_pt.set_y(self.get_pt().get_y())
+	def get_lerp_pt(self, alpha: float) -> Vector:
+		return self.get_prev_pt().add(self.get_pt().subtract(self.get_prev_pt()).scalar(alpha))
 	def get_is_finished(self) -> bool:
 		return self._is_finished
 	def set_is_finished(self, is_finished: bool) -> None:
@@ -250,6 +492,8 @@ class Player(AdvancedHitbox): # p
 		return self._space_was_down
 	def set_space_was_down(self, space_down: bool) -> None:
 		self._space_was_down = space_down
+	def get_has_jumped(self) -> bool:
+		return self._has_jumped
 	def get_jumped_while_sliding(self) -> bool:
 		return self._jumped_while_sliding
 	def set_jumped_while_sliding(self, jumped_while_sliding: bool) -> None:
@@ -260,33 +504,31 @@ class Player(AdvancedHitbox): # p
 		self._is_stuck = is_stuck
 	def get_is_sliding(self) -> bool:
 		return self._is_sliding
-	def set_is_sliding(self, is_sliding: bool, walls: list[Surface], delta, keys_down: list[bool]) -> None:
-		p_temp = copy.deepcopy(self)
+	def set_is_sliding(self, is_sliding: bool, wall_grid: WallGrid, delta, inputs: Inputs) -> None:
+		# where change_dimensions() would put the player
+		x_probe = self.get_pt().get_x()
+		y_probe = self.get_pt().get_y() + (self.get_h() - self.get_w())
 		if not self._is_sliding and is_sliding:
-			p_temp.change_dimensions()
 			can_slide = True
-			for wall in walls:
-				if p_temp.check_collisions(wall):
-					can_slide = False
+			for wall in wall_grid.get_collisions(self, x_probe, y_probe, True):
+				can_slide = False
+				break
 			if can_slide:
 				self.change_dimensions()
-				if keys_down[K_d]:
+				if inputs.walk_right:
 					self.get_vec_move().set_x(800)
-				elif keys_down[K_a]:
+				elif inputs.walk_left:
 					self.get_vec_move().set_x(-800)
 				# print(self.get_pt().get_x())
 			self._is_sliding = can_slide
 		elif self._is_sliding and not is_sliding:
 			if self.get_vec_move().get_x() < 0:
 				# print("\n\n\n\n",self.get_pt().get_x(), "\n\n\n\n")
-				p_temp.get_pt().set_x(p_temp.get_pt().get_x() + (p_temp.get_w() - self.get_h()))
-				hb = p_temp.get_hbps()[0]
-				hb.get_pt().set_x(hb.get_pt().get_x() + (hb.get_w() - self.get_h()))
-			p_temp.change_dimensions()
+				x_probe += self.get_w() - self.get_h()
 			can_stand = True
-			for wall in walls:
-				if p_temp.check_collisions(wall):
-					can_stand = False
+			for wall in wall_grid.get_collisions(self, x_probe, y_probe, True):
+				can_stand = False
+				break
 			if can_stand:
 				if self.get_vec_move().get_x() < 0:
 					# print(self.get_pt().get_x())
@@ -313,13 +555,18 @@ class Player(AdvancedHitbox): # p
 			hb.set_w(temp)
 			hb.get_pt().set_y(hb.get_pt().get_y() + (hb.get_w() - hb.get_h()))
 
-	def handle_keys(self, keys_down: list[bool], hb_mouse: Hitbox, delta: float, walls: list[Surface], teleporters: list[Teleporter]) -> None:
+	def handle_keys(self, keys_down: list[bool], hb_mouse: Hitbox, delta: float, wall_grid: WallGrid, checkpoints: Checkpoints, camera: Camera) -> None:
+		self.update(Inputs.from_keys(keys_down, self.user), delta, wall_grid, checkpoints, camera)
+
+	def update(self, inputs: Inputs, delta: float, wall_grid: WallGrid, checkpoints: Checkpoints, camera: Camera) -> None:
+		self._has_jumped = False
+		checkpoints.add_time(delta)
 		if not self.get_can_fly():
 			self.get_vec_move().set_y(self.get_vec_move().get_y() + 1000 * delta)
 			# if self.get_vec_move().get_y() > self.get_terminal_vel():
 			# 	self.get_vec_move().set_y(self.get_terminal_vel())
 		# print(self.get_space_was_down())
-			if keys_down[self.user.jump] and self.get_is_grounded() and not self.get_jumped_while_sliding():
+			if inputs.jump and self.get_is_grounded() and not self.get_jumped_while_sliding():
 				# print(self.get_is_grounded())
 				# print(self.get_vec_move().get_y() - 500)
 				self.get_vec_move().set_y(self.get_vec_move().get_y() - 500)
@@ -327,132 +574,168 @@ class Player(AdvancedHitbox): # p
 				# print(self.get_space_was_down(), "aaaaaaaa")
 				self.set_is_grounded(False)
 				self.set_space_was_down(False)
+				self._has_jumped = True
 				if self.get_is_sliding():
 					self.set_jumped_while_sliding(True)
-			elif keys_down[self.user.jump] and not self.get_is_grounded() and self.get_can_double_jump() and self.get_space_was_down() and not self.get_jumped_while_sliding():
+			elif inputs.jump and not self.get_is_grounded() and self.get_can_double_jump() and self.get_space_was_down() and not self.get_jumped_while_sliding():
 				self.get_vec_move().set_y(0)
 				self.get_vec_move().set_y(self.get_vec_move().get_y() - 350)
 				self.set_can_double_jump(False)
 				self.set_space_was_down(False)
+				self._has_jumped = True
 				if self.get_is_sliding():
 					self.set_jumped_while_sliding(True)
-			elif not keys_down[self.user.jump] and not self.get_space_was_down():
+			elif not inputs.jump and not self.get_space_was_down():
 				self.set_space_was_down(True)
-			if keys_down[self.user.walk_left] and not self.get_is_sliding():
+			if inputs.walk_left and not self.get_is_sliding():
 				move = -self.get_ms()
 				if not self.get_is_grounded():
 					move *= .45
 				self.get_vec_move().set_x(move)
-			if keys_down[self.user.walk_right] and not self.get_is_sliding():
+			if inputs.walk_right and not self.get_is_sliding():
 				move = self.get_ms()
 				if not self.get_is_grounded():
 					move *= .45
 				self.get_vec_move().set_x(move)
-			if keys_down[self.user.walk_left] and self.get_is_sliding() and self.get_is_stuck():
-				self.set_is_sliding(False, walls, delta, keys_down)
+			if inputs.walk_left and self.get_is_sliding() and self.get_is_stuck():
+				self.set_is_sliding(False, wall_grid, delta, inputs)
 				move = -self.get_ms()
 				self.get_vec_move().set_x(move)
-			if keys_down[self.user.walk_right] and self.get_is_sliding() and self.get_is_stuck():
-				self.set_is_sliding(False, walls, delta, keys_down)
+			if inputs.walk_right and self.get_is_sliding() and self.get_is_stuck():
+				self.set_is_sliding(False, wall_grid, delta, inputs)
 				move = self.get_ms()
 				self.get_vec_move().set_x(move)
-			if keys_down[self.user.slide] and self.get_is_grounded() and not self.get_is_sliding():
-				self.set_is_sliding(True, walls, delta, keys_down)
+			if inputs.slide and self.get_is_grounded() and not self.get_is_sliding():
+				self.set_is_sliding(True, wall_grid, delta, inputs)
 		else:
-			if keys_down[K_p]:
+			if inputs.fly:
 				self.set_can_fly(not self.get_can_fly())
 			else:
-				if keys_down[K_SPACE]:
+				if inputs.jump:
 					self.get_vec_move().set_y(self.get_vec_move().get_y() - 10)
-				elif keys_down[K_LCTRL]:
+				elif inputs.slide:
 					self.get_vec_move().set_y(self.get_vec_move().get_y() + 10)
 				else:
 					self.get_vec_move().set_y(0)
-				if keys_down[K_a]:
+				if inputs.walk_left:
 					self.get_vec_move().set_x(-self.get_ms())
-				elif keys_down[K_d]:
+				elif inputs.walk_right:
 					self.get_vec_move().set_x(self.get_ms())
 				else:
 					self.get_vec_move().set_x(0)
+		# cut the move into pieces when it is fast enough to skip over a wall
+		steps = self.calc_steps(delta, wall_grid)
+		was_grounded = False
+		for step in range(steps):
+			self.move(inputs, delta / steps, wall_grid, checkpoints, camera, delta)
+			if not self.get_is_alive() or self.get_is_finished():
+				break
+			# landing part way through stops the fall, so later pieces have nothing to land on
+			# which is why the landing piece takes the whole tick's friction
+			was_grounded = was_grounded or self.get_is_grounded()
+			self.set_is_grounded(was_grounded)
+
+	def calc_steps(self, delta: float, wall_grid: WallGrid, max_steps: int = MAX_STEPS) -> int:
+		# one step unless sweeping the move hits a wall that move's own checks would miss, then enough that no step is longer than the player
+		dx = self.get_vec_move().get_x() * delta
+		dy = self.get_vec_move().get_y() * delta
+		size = min(self.get_w(), self.get_h())
+		if abs(dx) < size and abs(dy) < size:
+			# the checks at the end of the move can't miss a wall
+			return 1
+		x1, y1, x2, y2 = self.get_probe_bounds(self.get_pt().get_x(), self.get_pt().get_y())
+		w = x2 - x1
+		h = y2 - y1
+		bounds = (x1, y1, x2, y2)
+		for wall in wall_grid.query(min(x1, x1 + dx), min(y1, y1 + dy), max(x2, x2 + dx), max(y2, y2 + dy)):
+			if wall.calc_sweep(bounds, dx, dy) == -1:
+				continue
+			# move checks the fall first and then the full move
+			wx1, wy1, wx2, wy2 = wall.get_bounds()
+			is_caught = wy1 < y2 + dy and y1 + dy < wy2 and ((wx1 < x2 and x1 < wx2) or (wx1 < x2 + dx and x1 + dx < wx2))
+			if not is_caught:
+				return min(max_steps, int(max(abs(dx) / w, abs(dy) / h)) + 1)
+		return 1
+
+	def move(self, inputs: Inputs, delta: float, wall_grid: WallGrid, checkpoints: Checkpoints, camera: Camera, tick: float = None) -> None:
+		# delta is this piece of the tick, tick the whole of it for the friction of a landing
+		if tick is None:
+			tick = delta
 		# print(self.get_vec_move())
 		# force = (keys_down[K_d] * self.get_ms() + keys_down[K_a] * -1 * self.get_ms())
-		p_temp = copy.deepcopy(self)
-		# print(p_temp)
-
-		p_temp.get_pt().set_y(p_temp.get_pt().get_y() + p_temp.get_vec_move().get_y() * delta)
-		# print(p_temp.get_pt())
-		p_temp.update_hbps()
+		# probe where the player is about to move using the state from before any collisions
+		x_move_probe = self.get_vec_move().get_x()
+		y_move_probe = self.get_vec_move().get_y()
+		is_sliding_probe = self.get_is_sliding()
+		is_grounded_probe = self.get_is_grounded()
+		x_probe = self.get_pt().get_x()
+		y_probe = self.get_pt().get_y() + y_move_probe * delta
 		is_grounded = False
-		for wall in walls:
-			if p_temp.check_collisions(wall):
-				if wall.get_is_teleport():
-					if wall.get_is_active():
-						if wall.get_next_tp() != wall:
-							wall.teleport(self, walls)
-					elif wall.get_num() != 0 and not teleporters[0].get_is_active():
-						wall.set_is_active(True)
-						teleporters[0].set_is_active(True)
-						for tp in teleporters:
-							if tp.get_is_active():
-								tp.set_next_tp(wall)
-					elif wall.get_num() != 0:
-						wall.set_is_active(True)
-						# print(wall.get_num(), teleporters[0].get_next_tp().get_num())
-						if wall.get_num() > teleporters[0].get_next_tp().get_num():
-							for tp in teleporters:
-								if tp.get_is_active():
-									tp.set_next_tp(wall)
-						else:
-							wall.set_next_tp(teleporters[0].get_next_tp())
-
-				# print(type(wall))
-				elif wall.get_can_kill():
+		self._profiler.begin("collide_y")
+		for wall in wall_grid.get_collisions(self, x_probe, y_probe):
+			if wall.get_is_teleport():
+				if wall.get_is_active():
+					if wall.get_next_tp() != wall:
+						wall.teleport(self, camera)
+						# the probe travels with the player so the horizontal check happens at the destination
+						y_probe += wall.calc_height()
+				elif wall != checkpoints.get_first():
+					checkpoints.activate(wall)
+
+			# print(type(wall))
+			elif wall.get_can_kill():
+				self.set_is_alive(False)
+				break
+			elif wall.get_is_finish():
+				self.set_is_finished(True)
+				break
+			# print("Yes")
+			y_probe -= y_move_probe * delta
+			if self.get_vec_move().get_y() > 0:
+				# print("Yes")
+				# self.get_vec_move().set_x(0)
+				is_grounded = True
+				# if self.get_is_sliding():
+				# 	friction_reduction = abs(self.get_vec_move().get_x()) - (abs(self.get_vec_move().get_x()) * wall.get_friction() * 108 * delta)
+				# 	# print(friction_reduction)
+				# else:
+				# 	friction_reduction = abs(self.get_vec_move().get_x()) - (abs(self.get_vec_move().get_x()) * wall.get_friction() * 100 * delta)
+				# print(wall.get_friction())
+				x_move = self.get_vec_move().get_x() + (self.get_vec_move().get_x() * wall.get_friction()) * 60 * tick
+				if x_move * self.get_vec_move().get_x() < 0:
+					# at a low tick rate a whole tick of friction is more than the speed there is, it stops rather than turning around
+					x_move = 0
+				self.get_vec_move().set_x(x_move)
+				# print(self.sget_vec_move())
+				if abs(self.get_vec_move().get_x()) < .08:
+					# print("Yes?")
+					self.set_is_sliding(False, wall_grid, delta, inputs)
+					self.get_vec_move().set_x(0)
+					self.set_jumped_while_sliding(False)
+				# print(self.get_vec_move().get_y())
+				# if self.get_vec_move().get_y() > 1000:
+				# 	print("Splat sfx")
+			self.get_vec_move().set_y(0)
+			break
+		self._profiler.end("collide_y")
+		x_probe += x_move_probe * delta
+		# standing up from a slide above swaps the player's dimensions, but the probe keeps the old ones
+		swapped = self.get_is_sliding() != is_sliding_probe
+		self._profiler.begin("collide_x")
+		if self.get_is_alive() or self.get_is_finished():
+			for wall in wall_grid.get_collisions(self, x_probe, y_probe, swapped):
+				if wall.get_can_kill():
 					self.set_is_alive(False)
 					break
-				elif wall.get_is_finish():
+				if wall.get_is_finish():
 					self.set_is_finished(True)
 					break
-				# print("Yes")
-				p_temp.get_pt().set_y(p_temp.get_pt().get_y() - p_temp.get_vec_move().get_y() * delta)
-				if self.get_vec_move().get_y() > 0:
-					# print("Yes")
-					# self.get_vec_move().set_x(0)
-					is_grounded = True
-					# if self.get_is_sliding():
-					# 	friction_reduction = abs(self.get_vec_move().get_x()) - (abs(self.get_vec_move().get_x()) * wall.get_friction() * 108 * delta)
-					# 	# print(friction_reduction)
-					# else:
-					# 	friction_reduction = abs(self.get_vec_move().get_x()) - (abs(self.get_vec_move().get_x()) * wall.get_friction() * 100 * delta)
-					# print(wall.get_friction())
-					self.get_vec_move().set_x(self.get_vec_move().get_x() + (self.get_vec_move().get_x() * wall.get_friction()) * 60 * delta)
-					# print(self.sget_vec_move())
-					if abs(self.get_vec_move().get_x()) < .08:
-						# print("Yes?")
-						self.set_is_sliding(False, walls, delta, keys_down)
-						self.get_vec_move().set_x(0)
-						self.set_jumped_while_sliding(False)
-					# print(self.get_vec_move().get_y())
-					# if self.get_vec_move().get_y() > 1000:
-					# 	print("Splat sfx")
-				self.get_vec_move().set_y(0)
+				if is_sliding_probe and not is_grounded_probe:
+					self.get_vec_move().set_x(-self.get_vec_move().get_x() * .3)
+				else:
+					self.get_vec_move().set_x(0)
 				break
-		p_temp.get_pt().set_x(p_temp.get_pt().get_x() + p_temp.get_vec_move().get_x() * delta)
-		p_temp.update_hbps()
-		if self.get_is_alive() or self.get_is_finished():
-			for wall in walls:
-				if p_temp.check_collisions(wall):
-					if wall.get_can_kill():
-						self.set_is_alive(False)
-						break
-					if wall.get_is_finish():
-						self.set_is_finished(True)
-						break
-					p_temp.get_pt().set_x(p_temp.get_pt().get_x() - p_temp.get_vec_move().get_x())
-					if p_temp.get_is_sliding() and not p_temp.get_is_grounded():
-						self.get_vec_move().set_x(-self.get_vec_move().get_x() * .3)
-					else:
-						self.get_vec_move().set_x(0)
-					break
+		self._profiler.end("collide_x")
 		# print("B", self.get_vec_move(), self.get_is_grounded())
 		# print(self.get_vec_move(), "Delta:", delta, "FPS:", (1/delta))
 		self.set_is_grounded(is_grounded)
@@ -462,59 +745,89 @@ class Player(AdvancedHitbox): # p
 		self.get_pt().set_x(self.get_pt().get_x() + self.get_vec_move().get_x() * delta)
 		# print("X * delta^2:", self.get_vec_move().get_x() * 100 * (delta ** 2), "Delta:", delta, "FPS:", (1/delta))
 		# print(self.get_vec_move().get_y() * delta, "What")
-		for wall in walls:
-			wall.get_pt().set_y(wall.get_pt().get_y() - self.get_vec_move().get_y() * delta)
+		self.get_pt().set_y(self.get_pt().get_y() + self.get_vec_move().get_y() * delta)
+		camera.add_vert_offset(self.get_vec_move().get_y() * delta)
 		# print(self.get_vec_move())
 		# print(self.get_vec_move().get_y() * delta)
 		# print(self.get_pt())
 		self.update_hbps()
 
-	def draw(self, win: pygame.Surface, color: str = "#00ff00") -> None:
-		super().draw(win)
+	def draw(self, win: pygame.Surface, vert_offset: float = 0, alpha: float = 1, color: str = "#00ff00") -> None:
+		# alpha blends between the last two physics ticks when the physics runs on a fixed timestep
+		pt = self.get_lerp_pt(alpha)
+		pygame.draw.rect(win, self.get_color(), pygame.Rect(pt.get_x(), pt.get_y() - vert_offset, self.get_w(), self.get_h()))
 
 class Surface(Hitbox):
+	__slots__ = ("_friction", "_kind")
+
 	def __init__(self, pt: Vector, w: float, h: float, friction: float, color: str = "#000000", can_kill: bool = False, is_finish: bool = False, is_teleport: bool = False):
 		super().__init__(pt, w, h, color)
-		self._friction = friction
-		self._can_kill = can_kill
-		self._is_finish = is_finish
-		self._is_teleport = is_teleport
+		self._kind = 0 # KIND_* flags instead of a bool attribute for each
+		self.set_friction(friction)
+		self.set_can_kill(can_kill)
+		self.set_is_finish(is_finish)
+		self.set_is_teleport(is_teleport)
 
 	def get_friction(self) -> float:
 		return self._friction
 	def set_friction(self, friction: float) -> None:
 		self._friction = friction
+		self.set_kind_flag(KIND_ICE, friction == 0)
+	def get_kind(self) -> int:
+		return self._kind
+	def set_kind_flag(self, flag: int, value: bool) -> None:
+		if value:
+			self._kind |= flag
+		else:
+			self._kind &= ~flag
 	def get_can_kill(self) -> bool:
-		return self._can_kill
+		return self._kind & KIND_KILL != 0
 	def set_can_kill(self, can_kill: bool) -> None:
-		self._can_kill = can_kill
+		self.set_kind_flag(KIND_KILL, can_kill)
 	def get_is_finish(self) -> bool:
-		return self._is_finish
+		return self._kind & KIND_FINISH != 0
 	def set_is_finish(self, is_finish: bool) -> None:
-		self._is_finish = is_finish
+		self.set_kind_flag(KIND_FINISH, is_finish)
 	def get_is_teleport(self) -> bool:
-		return self._is_teleport
-	def set_is_finish(self, is_teleport: bool) -> None:
-		self._is_teleport = is_teleport
+		return self._kind & KIND_TELEPORT != 0
+	def set_is_teleport(self, is_teleport: bool) -> None:
+		self.set_kind_flag(KIND_TELEPORT, is_teleport)
 
 class Teleporter(Surface):
-	def __init__(self, pt: Vector, w: float, h: float, next_tp: Teleporter, num: int, friction: float = -.15, color: str = "#7c7c7c"):
+	__slots__ = ("_checkpoints", "_is_active", "_num", "_is_dirty")
+	_not_active_color = "#7c7c7c"
+	_active_color = "#990099"
+
+	def __init__(self, pt: Vector, w: float, h: float, num: int, friction: float = -.15, color: str = "#7c7c7c"):
 		super().__init__(pt, w, h, friction, color, False, False, True)
-		self._next_tp = next_tp
+		self._checkpoints: Checkpoints = None # the level's, set when it is made
 		self._is_active = False
 		self._num = num
-		self._not_active_color = "#7c7c7c"
-		self._active_color = "#990099"
+		self._is_dirty = False # the color changed since the level was last drawn
 
+	def get_checkpoints(self) -> Checkpoints:
+		return self._checkpoints
+	def set_checkpoints(self, checkpoints: Checkpoints) -> None:
+		self._checkpoints = checkpoints
 	def get_next_tp(self) -> Teleporter:
-		return self._next_tp
-	def set_next_tp(self, tp: Teleporter) -> None:
-		self._next_tp = tp
+		# every active teleporter sends the player to the furthest one reached, the rest go nowhere
+		if self._is_active and self._checkpoints is not None:
+			return self._checkpoints.get_furthest()
+		return self
 	def get_is_active(self) -> bool:
 		return self._is_active
 	def set_is_active(self, is_active: bool) -> None:
+		# use Checkpoints.activate so the furthest one stays right
 		self._is_active = is_active
-		self.set_color(self._active_color)
+		if is_active:
+			self.set_color(self._active_color)
+		else:
+			self.set_color(self._not_active_color)
+		self._is_dirty = True
+	def get_is_dirty(self) -> bool:
+		return self._is_dirty
+	def set_is_dirty(self, is_dirty: bool) -> None:
+		self._is_dirty = is_dirty
 	def get_num(self) -> int:
 		return self._num
 	def set_num(self, num: int) -> None:
@@ -524,16 +837,732 @@ class Teleporter(Surface):
 		dis = self.get_next_tp().get_pt().get_y() - self.get_pt().get_y()
 		return dis
 
-	def teleport(self, player: Player, walls: list[Surface]) -> None:
+	def teleport(self, player: Player, camera: Camera) -> None:
 		player.get_pt().set_x(self.get_next_tp().get_pt().get_x() + (self.get_next_tp().get_w() / 2) - (player.get_w() / 2))
 		player.get_vec_move().set_x(0)
 		player.get_vec_move().set_y(0)
 		dif = self.calc_height()
 		# print("teleport sfx")
-		for wall in walls:
-			wall.get_pt().set_y(wall.get_pt().get_y() - dif)
+		player.get_pt().set_y(player.get_pt().get_y() + dif)
+		camera.add_vert_offset(dif)
+		# jump straight there instead of sliding the view across the level
+		player.save_prev_pt()
+		camera.save_prev_vert_offset()
+
+class Checkpoints(): # cp
+	# a level's teleporters by num, keeping the furthest one reached so activating one never has to visit the others
+	def __init__(self, teleporters: list[Teleporter]):
+		self._teleporters: list[Teleporter] = sorted(teleporters, key=lambda tp: tp.get_num())
+		self._by_num: dict[int, Teleporter] = {}
+		for tp in self._teleporters:
+			self._by_num[tp.get_num()] = tp
+			tp.set_checkpoints(self)
+		self._active: list[Teleporter] = [] # in the order they were reached
+		self._furthest: Teleporter = None
+		self._arrivals: dict[int, float] = {} # num: level time it was reached
+		self._time: float = 0 # physics time on this level
+
+	def __len__(self) -> int:
+		return len(self._teleporters)
+	def __iter__(self):
+		return iter(self._teleporters)
+	def __getitem__(self, num: int) -> Teleporter:
+		return self._by_num[num]
+
+	def get(self, num: int) -> Teleporter:
+		return self._by_num.get(num)
+	def get_first(self) -> Teleporter:
+		# where the level starts, it only turns on once another one is reached
+		if len(self._teleporters) == 0:
+			return None
+		return self._teleporters[0]
+	def get_furthest(self) -> Teleporter:
+		return self._furthest
+	def get_active_count(self) -> int:
+		return len(self._active)
+	def get_active_nums(self) -> list[int]:
+		return sorted(tp.get_num() for tp in self._active)
+	def get_arrival(self, num: int) -> float:
+		return self._arrivals.get(num)
+	def get_arrivals(self) -> dict[int, float]:
+		return self._arrivals
+	def get_time(self) -> float:
+		return self._time
+	def set_time(self, time: float) -> None:
+		self._time = time
+	def add_time(self, delta: float) -> None:
+		self._time += delta
+
+	def activate(self, tp: Teleporter) -> None:
+		# the first one comes on with the first one reached so the start can send the player on
+		if tp.get_is_active():
+			return
+		first = self.get_first()
+		if not first.get_is_active():
+			self.add_active(first)
+		self.add_active(tp)
 
+	def add_active(self, tp: Teleporter) -> None:
+		tp.set_is_active(True)
+		self._active.append(tp)
+		self._arrivals[tp.get_num()] = self._time
+		if self._furthest is None or tp.get_num() > self._furthest.get_num():
+			self._furthest = tp
 
+	def set_active_nums(self, nums: list[int]) -> None:
+		# for starting a replay that began at a checkpoint
+		self.set_state(((), None, {}))
+		for num in sorted(nums):
+			self.add_active(self._by_num[num])
+
+	def get_state(self) -> tuple:
+		return (tuple(self._active), self._furthest, dict(self._arrivals))
+
+	def set_state(self, state: tuple) -> None:
+		# only the teleporters that differ get touched
+		active, furthest, arrivals = state
+		for tp in self._active:
+			if tp not in active:
+				tp.set_is_active(False)
+		for tp in active:
+			if not tp.get_is_active():
+				tp.set_is_active(True)
+		self._active = list(active)
+		self._furthest = furthest
+		self._arrivals = dict(arrivals)
+
+class WallArrays(): # wa
+	# the walls as numpy arrays so a hitbox can be checked against all of them in one call
+	def __init__(self, walls: list[Surface]):
+		self._walls: list[Surface] = walls
+		self._x = np.array([wall.get_pt().get_x() for wall in walls], dtype=np.float64)
+		self._y = np.array([wall.get_pt().get_y() for wall in walls], dtype=np.float64)
+		self._w = np.array([wall.get_w() for wall in walls], dtype=np.float64)
+		self._h = np.array([wall.get_h() for wall in walls], dtype=np.float64)
+		self._x2 = self._x + self._w
+		self._y2 = self._y + self._h
+		self._friction = np.array([wall.get_friction() for wall in walls], dtype=np.float64)
+		self._kinds = np.array([wall.get_kind() for wall in walls], dtype=np.uint8)
+
+	def get_walls(self) -> list[Surface]:
+		return self._walls
+	def get_friction(self) -> np.ndarray:
+		return self._friction
+	def get_kinds(self) -> np.ndarray:
+		return self._kinds
+
+	def get_mask(self, x1: float, y1: float, x2: float, y2: float) -> np.ndarray:
+		# same test as Hitbox.check_collide for every wall at once
+		return (x1 < self._x2) & (self._x < x2) & (y1 < self._y2) & (self._y < y2)
+
+	def get_collisions(self, x1: float, y1: float, x2: float, y2: float) -> list[int]:
+		return np.flatnonzero(self.get_mask(x1, y1, x2, y2)).tolist()
+
+	def get_first_collision(self, x1: float, y1: float, x2: float, y2: float) -> int:
+		mask = self.get_mask(x1, y1, x2, y2)
+		i = int(mask.argmax())
+		return i if mask[i] else -1
+
+class WallGrid(): # wg
+	# uniform grid over the level so collision checks only look at walls near the player
+	def __init__(self, walls: list[Surface], cell_size: float = 256, max_grid_cells: int = 16):
+		self._walls: list[Surface] = walls
+		self._cell_size: float = cell_size
+		self._cells: dict[tuple[int, int], list[int]] = {}
+		for i in range(len(walls)):
+			for cell in self.calc_cells(*walls[i].get_bounds()):
+				if cell not in self._cells:
+					self._cells[cell] = []
+				self._cells[cell].append(i)
+		# areas covering more cells than this are checked against every wall with numpy instead
+		self._max_grid_cells: int = max_grid_cells
+		self._arrays: WallArrays = WallArrays(walls) if np is not None and len(walls) > 0 else None
+
+	def get_walls(self) -> list[Surface]:
+		return self._walls
+	def get_cell_size(self) -> float:
+		return self._cell_size
+	def get_arrays(self) -> WallArrays:
+		return self._arrays
+	def get_max_grid_cells(self) -> int:
+		return self._max_grid_cells
+	def set_max_grid_cells(self, max_grid_cells: int) -> None:
+		self._max_grid_cells = max_grid_cells
+
+	def count_cells(self, x1: float, y1: float, x2: float, y2: float) -> int:
+		size = self.get_cell_size()
+		return (math.floor(x2 / size) - math.floor(x1 / size) + 1) * (math.floor(y2 / size) - math.floor(y1 / size) + 1)
+
+	def use_arrays(self, x1: float, y1: float, x2: float, y2: float) -> bool:
+		return self._arrays is not None and self.count_cells(x1, y1, x2, y2) > self._max_grid_cells
+
+	def calc_cells(self, x1: float, y1: float, x2: float, y2: float) -> list[tuple[int, int]]:
+		size = self.get_cell_size()
+		cells = []
+		for cx in range(math.floor(x1 / size), math.floor(x2 / size) + 1):
+			for cy in range(math.floor(y1 / size), math.floor(y2 / size) + 1):
+				cells.append((cx, cy))
+		return cells
+
+	def query(self, x1: float, y1: float, x2: float, y2: float) -> list[Surface]:
+		if self.use_arrays(x1, y1, x2, y2):
+			return [self._walls[i] for i in self._arrays.get_collisions(x1, y1, x2, y2)]
+		found = set()
+		for cell in self.calc_cells(x1, y1, x2, y2):
+			if cell in self._cells:
+				found.update(self._cells[cell])
+		# keep the order of the map file so the first collision is the same as a full scan
+		return [self._walls[i] for i in sorted(found)]
+
+	def get_nearby(self, hb: Hitbox) -> list[Surface]:
+		return self.query(*hb.get_bounds())
+
+	def get_collisions(self, ahb: AdvancedHitbox, x: float, y: float, swapped: bool = False):
+		# walls the ahb would hit if it was at (x, y), in map file order
+		bounds = ahb.get_probe_bounds(x, y, swapped)
+		if self.use_arrays(*bounds):
+			found = set()
+			for hbp_bounds in ahb.get_hbp_probe_bounds(x, y, swapped):
+				found.update(self._arrays.get_collisions(*hbp_bounds))
+			for i in sorted(found):
+				yield self._walls[i]
+		else:
+			for wall in self.query(*bounds):
+				if ahb.check_probe_collisions(wall, x, y, swapped):
+					yield wall
+
+class Camera(): # cam
+	# walls stay where the map file put them, only the view moves
+	def __init__(self):
+		self._vert_offset: float = 0
+		self._prev_vert_offset: float = 0 # offset before the last physics tick
+
+	def get_vert_offset(self) -> float:
+		return self._vert_offset
+	def set_vert_offset(self, vert_offset: float) -> None:
+		self._vert_offset = vert_offset
+	def add_vert_offset(self, vert_offset: float) -> None:
+		self._vert_offset += vert_offset
+	def get_prev_vert_offset(self) -> float:
+		return self._prev_vert_offset
+	def save_prev_vert_offset(self) -> None:
+		self._prev_vert_offset = self._vert_offset
+	def get_lerp_vert_offset(self, alpha: float) -> float:
+		return self._prev_vert_offset + (self._vert_offset - self._prev_vert_offset) * alpha
+
+class LevelSnapshot(): # ls
+	# the parts of a loaded level that change while playing, so a respawn can put them back without loading the map again
+	# walls never move, so they are shared rather than copied
+	def __init__(self, checkpoints: Checkpoints, camera: Camera):
+		self.capture_checkpoints(checkpoints)
+		self.capture_camera(camera)
+
+	def capture_checkpoints(self, checkpoints: Checkpoints) -> None:
+		self._checkpoints: Checkpoints = checkpoints
+		self._state: tuple = checkpoints.get_state()
+
+	def capture_camera(self, camera: Camera) -> None:
+		self._vert_offset: float = camera.get_vert_offset()
+		self._prev_vert_offset: float = camera.get_prev_vert_offset()
+
+	def get_active_count(self) -> int:
+		return len(self._state[0])
+
+	def get_is_current(self, checkpoints: Checkpoints) -> bool:
+		# teleporters only ever get activated while playing, so the count is enough to tell
+		return checkpoints.get_active_count() == self.get_active_count()
+
+	def restore(self, camera: Camera) -> None:
+		self._checkpoints.set_state(self._state)
+		camera.set_vert_offset(self._prev_vert_offset)
+		camera.save_prev_vert_offset()
+		camera.set_vert_offset(self._vert_offset)
+
+class TileCache(): # tc
+	# the walls drawn once into strips of the level, so a frame only blits the strips on screen
+	def __init__(self, wall_grid: WallGrid, teleporters: list[Teleporter], w: int, tile_h: int = 512, max_tiles: int = 8, color: str = "#fdf6e3"):
+		self._wall_grid: WallGrid = wall_grid
+		self._teleporters: list[Teleporter] = teleporters
+		self._w: int = w
+		self._tile_h: int = tile_h
+		# a tall level would need hundreds of MB drawn all at once, so strips are drawn when first seen and the oldest are dropped
+		self._max_tiles: int = max_tiles
+		self._color: str = color
+		self._tiles: OrderedDict[int, pygame.Surface] = OrderedDict()
+
+	def get_wall_grid(self) -> WallGrid:
+		return self._wall_grid
+	def get_tile_h(self) -> int:
+		return self._tile_h
+	def get_max_tiles(self) -> int:
+		return self._max_tiles
+	def set_max_tiles(self, max_tiles: int) -> None:
+		self._max_tiles = max_tiles
+	def count_tiles(self) -> int:
+		return len(self._tiles)
+
+	def calc_tiles(self, y1: float, y2: float) -> range:
+		return range(math.floor(y1 / self._tile_h), math.floor(y2 / self._tile_h) + 1)
+
+	def invalidate(self, y1: float, y2: float) -> None:
+		for i in self.calc_tiles(y1, y2):
+			self._tiles.pop(i, None)
+
+	def clear(self) -> None:
+		self._tiles.clear()
+
+	def update(self) -> None:
+		# teleporters are the only walls that change color, so only their strips get drawn again
+		for tp in self._teleporters:
+			if tp.get_is_dirty():
+				x1, y1, x2, y2 = tp.get_bounds()
+				self.invalidate(y1, y2)
+				tp.set_is_dirty(False)
+
+	def get_tile(self, i: int) -> pygame.Surface:
+		if i in self._tiles:
+			self._tiles.move_to_end(i)
+			return self._tiles[i]
+		y = i * self._tile_h
+		tile = pygame.Surface((self._w, self._tile_h))
+		tile.fill(self._color)
+		for wall in self._wall_grid.query(0, y, self._w, y + self._tile_h):
+			wall.draw(tile, y)
+		self._tiles[i] = tile
+		while len(self._tiles) > self._max_tiles:
+			self._tiles.popitem(last=False)
+		return tile
+
+	def draw(self, win: pygame.Surface, vert_offset: float = 0) -> int:
+		# covers the whole window, returns how many strips were blitted
+		self.update()
+		top = math.floor(vert_offset)
+		tiles = self.calc_tiles(top, top + win.get_height() - 1)
+		for i in tiles:
+			win.blit(self.get_tile(i), (0, i * self._tile_h - top))
+		return len(tiles)
+
+class FixedTimestep(): # ft
+	# runs the physics in equal ticks no matter how fast frames are drawn
+	def __init__(self, tick_rate: float = 120, max_ticks: int = 8):
+		self._tick: float = 1 / tick_rate
+		self._max_ticks: int = max_ticks
+		self._accumulator: float = 0
+		self._is_reset: bool = False # the frame in progress started before the reset
+
+	def get_tick(self) -> float:
+		return self._tick
+	def set_tick_rate(self, tick_rate: float) -> None:
+		self._tick = 1 / tick_rate
+	def get_max_ticks(self) -> int:
+		return self._max_ticks
+	def set_max_ticks(self, max_ticks: int) -> None:
+		self._max_ticks = max_ticks
+	def get_alpha(self) -> float:
+		# how far between the last two ticks the current frame is
+		return max(0, min(1, self._accumulator / self._tick))
+
+	def add_time(self, delta: float) -> int:
+		if self._is_reset:
+			# that frame's time was spent in a menu or loading, not playing
+			self._is_reset = False
+			delta = 0
+		self._accumulator += delta
+		ticks = int(self._accumulator / self._tick)
+		self._accumulator -= ticks * self._tick
+		if ticks > self._max_ticks:
+			# too far behind to catch up, so the game slows down instead of spending the whole frame on physics
+			ticks = self._max_ticks
+		return ticks
+
+	def reset(self) -> None:
+		# for a new player, so the game doesn't start with ticks to catch up on
+		self._accumulator = 0
+		self._is_reset = True
+
+
+class Overlay(): # ov
+	# a frame of the level with the dim layer already on top, drawn once when the game is paused or the player dies
+	def __init__(self, color: tuple = (0, 0, 0, 128)):
+		self._color: tuple = color
+		self._frame: pygame.Surface = None
+		self._dim: pygame.Surface = None
+		self._is_valid: bool = False
+
+	def get_is_valid(self) -> bool:
+		return self._is_valid
+	def invalidate(self) -> None:
+		self._is_valid = False
+
+	def capture(self, win: pygame.Surface) -> None:
+		# keeps what is on win right now with the dim layer blended in
+		size = win.get_size()
+		if self._frame is None or self._frame.get_size() != size:
+			self._frame = pygame.Surface(size)
+			self._dim = pygame.Surface(size, pygame.SRCALPHA)
+			self._dim.fill(self._color)
+		self._frame.blit(win, (0, 0))
+		self._frame.blit(self._dim, (0, 0))
+		self._is_valid = True
+
+	def draw(self, win: pygame.Surface) -> None:
+		win.blit(self._frame, (0, 0))
+
+class GlyphAtlas(): # ga
+	# every character of a short changing string (timer, fps) rendered once, digits laid out in fixed width cells
+	def __init__(self, font: pygame.font, color: str, chars: str = "0123456789:. -"):
+		self._font = font
+		self._color = color
+		self._glyphs: dict[str, pygame.Surface] = {}
+		for char in chars:
+			self._glyphs[char] = font.render(char, True, color)
+		# as wide as the widest digit so the numbers don't jiggle as they change
+		self._cell_w: int = max(self._glyphs[char].get_width() for char in "0123456789" if char in self._glyphs)
+
+	def get_font(self) -> pygame.font:
+		return self._font
+	def get_color(self) -> str:
+		return self._color
+	def get_cell_w(self) -> int:
+		return self._cell_w
+	def get_height(self) -> int:
+		return self._font.get_height()
+
+	def calc_char_width(self, char: str) -> int:
+		# digits and the spaces padding them get a full cell, everything else keeps its own width
+		if char.isdigit() or char == " " or char not in self._glyphs:
+			return self._cell_w
+		return self._glyphs[char].get_width()
+
+	def calc_width(self, text: str) -> int:
+		width = 0
+		for char in text:
+			width += self.calc_char_width(char)
+		return width
+
+	def draw(self, win: pygame.Surface, text: str, x: float, y: float) -> int:
+		# returns how many glyphs were blitted
+		count = 0
+		for char in text:
+			if char not in self._glyphs:
+				self._glyphs[char] = self._font.render(char, True, self._color)
+			glyph = self._glyphs[char]
+			cell_w = self.calc_char_width(char)
+			if char != " ":
+				win.blit(glyph, (x + (cell_w - glyph.get_width()) / 2, y))
+				count += 1
+			x += cell_w
+		return count
+
+class TextCache(): # txc
+	# rendered text kept by (font, text, color), dropping the least recently used once it is full
+	def __init__(self, max_size: int = 256):
+		self._max_size: int = max_size
+		self._surfs: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+		self._atlases: dict[tuple, GlyphAtlas] = {}
+		self._hits: int = 0
+		self._misses: int = 0
+
+	def get_max_size(self) -> int:
+		return self._max_size
+	def set_max_size(self, max_size: int) -> None:
+		self._max_size = max_size
+	def get_hits(self) -> int:
+		return self._hits
+	def get_misses(self) -> int:
+		return self._misses
+	def count(self) -> int:
+		return len(self._surfs)
+
+	def render(self, font: pygame.font, text: str, color: str) -> pygame.Surface:
+		key = (font, text, color)
+		if key in self._surfs:
+			self._hits += 1
+			self._surfs.move_to_end(key)
+			return self._surfs[key]
+		self._misses += 1
+		surf = font.render(text, True, color)
+		self._surfs[key] = surf
+		while len(self._surfs) > self._max_size:
+			self._surfs.popitem(last=False)
+		return surf
+
+	def get_atlas(self, font: pygame.font, color: str) -> GlyphAtlas:
+		key = (font, color)
+		if key not in self._atlases:
+			self._atlases[key] = GlyphAtlas(font, color)
+		return self._atlases[key]
+
+	def clear(self) -> None:
+		self._surfs.clear()
+		self._atlases.clear()
+
+text_cache = TextCache() # shared by the buttons and the draw functions
+
+def calc_percentiles(samples: list[float], ps: list[float]) -> list[float]:
+	# nearest rank, sorting once for all of them
+	ordered = sorted(samples)
+	if len(ordered) == 0:
+		return [0 for p in ps]
+	return [ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] for p in ps]
+
+class Profiler(): # prof
+	# how long each part of a frame took, for the last size frames
+	def __init__(self, phases: list[str], size: int = 600, is_enabled: bool = True):
+		self._phases: list[str] = phases
+		self._size: int = size
+		self._is_enabled: bool = is_enabled
+		self._samples: dict[str, array] = {}
+		for phase in phases:
+			self._samples[phase] = array("d", bytes(8 * size))
+		self._frame: dict[str, float] = dict.fromkeys(phases, 0.0) # this frame so far, a phase can run more than once
+		self._starts: dict[str, float] = {}
+		self._index: int = 0 # where the next frame goes
+		self._count: int = 0 # frames in the buffer
+
+	def get_phases(self) -> list[str]:
+		return self._phases
+	def get_size(self) -> int:
+		return self._size
+	def get_count(self) -> int:
+		return self._count
+	def get_is_enabled(self) -> bool:
+		return self._is_enabled
+	def set_is_enabled(self, is_enabled: bool) -> None:
+		self._is_enabled = is_enabled
+
+	def begin(self, phase: str) -> None:
+		if self._is_enabled:
+			self._starts[phase] = time.perf_counter()
+
+	def end(self, phase: str) -> None:
+		if self._is_enabled and phase in self._starts:
+			self._frame[phase] += time.perf_counter() - self._starts.pop(phase)
+
+	def end_frame(self) -> None:
+		if not self._is_enabled:
+			return
+		for phase in self._phases:
+			self._samples[phase][self._index] = self._frame[phase]
+			self._frame[phase] = 0.0
+		self._index = (self._index + 1) % self._size
+		self._count = min(self._count + 1, self._size)
+
+	def get_samples(self, phase: str) -> list[float]:
+		# oldest first
+		samples = self._samples[phase]
+		if self._count < self._size:
+			return list(samples[:self._count])
+		return list(samples[self._index:]) + list(samples[:self._index])
+
+	def calc_percentiles(self, phase: str, ps: list[float]) -> list[float]:
+		return calc_percentiles(self.get_samples(phase), ps)
+	def calc_percentile(self, phase: str, p: float) -> float:
+		return self.calc_percentiles(phase, [p])[0]
+
+	def dump_csv(self, f_name: str) -> None:
+		# one row per frame, one column per phase, in seconds
+		columns = [self.get_samples(phase) for phase in self._phases]
+		f = open(f_name, "w")
+		f.write("frame," + ",".join(self._phases) + "\n")
+		for i in range(self._count):
+			f.write(str(i) + "," + ",".join("%.9f" % column[i] for column in columns) + "\n")
+		f.close()
+
+	def draw(self, win: pygame.Surface, font: pygame.font, phase: str = "frame", target: float = 1 / 60) -> None:
+		# p50 and p99 of every phase, with a graph of phase over the last frames under it
+		atlas = text_cache.get_atlas(font, "#ffffff")
+		line_h = atlas.get_height()
+		graph_h = 100
+		w = 420
+		x = win.get_width() - w - 10
+		y = 10
+		pygame.draw.rect(win, "#000000", (x, y, w, line_h * (len(self._phases) + 1) + graph_h + 30))
+		numbers_x = x + w - 10 - atlas.calc_width("000.00 000.00")
+		win.blit(text_cache.render(font, "ms", "#ffffff"), (x + 10, y + 5))
+		for label, numbers in (("p50", "000.00"), ("p99", "000.00 000.00")):
+			# right aligned over its column
+			surf_text = text_cache.render(font, label, "#ffffff")
+			win.blit(surf_text, (numbers_x + atlas.calc_width(numbers) - surf_text.get_width(), y + 5))
+		for i in range(len(self._phases)):
+			name = self._phases[i]
+			line_y = y + 5 + line_h * (i + 1)
+			p50, p99 = self.calc_percentiles(name, [50, 99])
+			win.blit(text_cache.render(font, name, "#ffffff"), (x + 10, line_y))
+			atlas.draw(win, "%6.2f %6.2f" % (p50 * 1000, p99 * 1000), numbers_x, line_y)
+		graph_y = y + line_h * (len(self._phases) + 1) + 20
+		samples = self.get_samples(phase)[-(w - 20):]
+		# the target frame time sits half way up the graph
+		scale = graph_h / 2 / target
+		pygame.draw.line(win, "#7c7c7c", (x + 10, graph_y + graph_h / 2), (x + w - 10, graph_y + graph_h / 2))
+		if len(samples) > 1:
+			points = [(x + 10 + i, graph_y + graph_h - min(graph_h, samples[i] * scale)) for i in range(len(samples))]
+			pygame.draw.lines(win, "#22ab7d", False, points)
+
+frame_profiler = Profiler(["events", "keys", "physics", "collide_y", "collide_x", "mouse", "draw", "flip", "wait", "frame"]) # filled in by main and the player it makes
+null_profiler = Profiler([], is_enabled=False) # for players nothing is watching, like the headless tools
+
+
+class FrameScheduler(): # fs
+	# waits out the rest of each frame instead of spinning, at a rate that can differ per screen
+	def __init__(self, fps: float = 60, spin: float = .002):
+		self._fps: float = fps # 0 means uncapped
+		self._spin: float = spin # the end of the wait is spun instead of slept since sleep can overshoot
+		self._policies: dict[str, float] = {}
+		self._frame_start: float = time.perf_counter()
+
+	def get_fps(self) -> float:
+		return self._fps
+	def set_fps(self, fps: float) -> None:
+		self._fps = fps
+	def get_spin(self) -> float:
+		return self._spin
+	def set_spin(self, spin: float) -> None:
+		self._spin = spin
+	def get_policy(self, screen: str) -> float:
+		return self._policies.get(screen, self._fps)
+	def set_policy(self, screen: str, fps: float) -> None:
+		self._policies[screen] = fps
+
+	def start_frame(self) -> float:
+		# returns the seconds since the last frame started
+		now = time.perf_counter()
+		delta = now - self._frame_start
+		self._frame_start = now
+		return delta
+
+	def wait(self, screen: str) -> None:
+		fps = self.get_policy(screen)
+		if fps <= 0:
+			return
+		deadline = self._frame_start + 1 / fps
+		remaining = deadline - time.perf_counter()
+		if remaining > self._spin:
+			time.sleep(remaining - self._spin)
+		while time.perf_counter() < deadline:
+			pass
+
+
+class Screen(): # scr
+	# one screen of the game, its hooks take no arguments so main keeps the state they read
+	def __init__(self, name: str, buttons = None, update = None, draw = None, enter = None, exit = None, parts = None, is_static: bool = False):
+		self._name: str = name
+		self._buttons = buttons # returns the buttons the mouse can click
+		self._update = update # input that isn't a button, before the mouse
+		self._draw = draw
+		self._enter = enter
+		self._exit = exit
+		self._parts = parts # returns (value, rect) pairs for anything besides the buttons that can change
+		self._is_static: bool = is_static # only drawn when one of its parts changed
+
+	def get_name(self) -> str:
+		return self._name
+	def get_is_static(self) -> bool:
+		return self._is_static
+
+	def get_buttons(self) -> list[Button]:
+		if self._buttons is None:
+			return []
+		return self._buttons()
+
+	def get_parts(self) -> list[tuple]:
+		# everything drawn that can change, with the rect it covers on the window
+		parts = []
+		for button in self.get_buttons():
+			parts.append(((button.get_text(), button.get_color()), pygame.Rect(button.get_pt().get_x(), button.get_pt().get_y(), button.get_w(), button.get_h())))
+		if self._parts is not None:
+			parts += self._parts()
+		return parts
+
+	def update(self) -> None:
+		if self._update is not None:
+			self._update()
+	def draw(self) -> None:
+		if self._draw is not None:
+			self._draw()
+	def enter(self) -> None:
+		if self._enter is not None:
+			self._enter()
+	def exit(self) -> None:
+		if self._exit is not None:
+			self._exit()
+
+class ScreenMachine(): # sm
+	# looks screens up by name and only puts on the display what changed since the last frame
+	def __init__(self, screens: list[Screen]):
+		self._screens: dict[str, Screen] = {}
+		for screen in screens:
+			self._screens[screen.get_name()] = screen
+		self._current: Screen = None
+		self._parts: list[tuple] = [] # what the current screen looked like when it was last drawn
+		self._is_dirty: bool = True # the next draw has to be the whole screen
+		self._is_full: bool = False # the whole window needs flipping
+		self._rects: list[pygame.Rect] = [] # or only these parts of it
+
+	def get_current(self) -> Screen:
+		return self._current
+	def get_screen(self, name: str) -> Screen:
+		return self._screens.get(name)
+	def get_is_dirty(self) -> bool:
+		return self._is_dirty
+	def invalidate(self) -> None:
+		self._is_dirty = True
+
+	def get_buttons(self, name: str) -> list[Button]:
+		# names that aren't screens, like "respawn", have no buttons
+		if name not in self._screens:
+			return []
+		return self._screens[name].get_buttons()
+
+	def update(self, name: str) -> None:
+		if name in self._screens:
+			self._screens[name].update()
+
+	def switch(self, name: str) -> None:
+		# names that aren't screens leave the current one up
+		if name not in self._screens or self._screens[name] is self._current:
+			return
+		if self._current is not None:
+			self._current.exit()
+		self._current = self._screens[name]
+		self._current.enter()
+		self._is_dirty = True
+
+	def draw(self) -> bool:
+		# returns whether anything was drawn
+		screen = self._current
+		if screen is None:
+			return False
+		if not screen.get_is_static():
+			screen.draw()
+			self._is_full = True
+			return True
+		parts = screen.get_parts()
+		if self._is_dirty or len(parts) != len(self._parts):
+			self._is_full = True
+		else:
+			rects = []
+			for (value, rect), (old_value, old_rect) in zip(parts, self._parts):
+				if value != old_value or rect != old_rect:
+					rects.append(rect.union(old_rect))
+			if len(rects) == 0:
+				return False
+			self._rects += rects
+		screen.draw()
+		self._parts = parts
+		self._is_dirty = False
+		return True
+
+	def present(self) -> bool:
+		# flips when the whole window changed, updates just the changed rects otherwise and skips it when nothing did
+		presented = self._is_full or len(self._rects) > 0
+		if self._is_full:
+			pygame.display.flip()
+		elif len(self._rects) > 0:
+			pygame.display.update(self._rects)
+		self._is_full = False
+		self._rects = []
+		return presented
 
 class Button(Hitbox):
 	def __init__(self, pt: Vector, w: float, h: float, text: String, has_border: bool, location: String, font: pygame.font, color: str = "#ffffff"):
@@ -565,7 +1594,7 @@ class Button(Hitbox):
 		# super().draw(win)
 		# 40 font
 		font = self.get_font()
-		surf_text = font.render(self.get_text(), True, self.get_color())
+		surf_text = text_cache.render(font, self.get_text(), self.get_color())
 		win.blit(surf_text, ((self.get_pt().get_x(), self.get_pt().get_y())))
 
 class ToggleButton(Button):
@@ -582,18 +1611,37 @@ class ToggleButton(Button):
 		# super().draw(win)
 		# 40 font
 		font = self.get_font()
-		surf_text = font.render(self.get_text(), True, self.get_color())
+		surf_text = text_cache.render(font, self.get_text(), self.get_color())
 		win.blit(surf_text, ((self.get_pt().get_x(), self.get_pt().get_y())))
 
 class Map():
-	def __init__(self, name: str, size: str, difficultly: str, description: str):
-		self._vert_offset = 0
+	def __init__(self, name: str, size: str, difficultly: str, description: str, id: int = 0, path: str = "", is_challenge: bool = False, color: str = "#ffffff"):
 		self._name = name
 		self._size = size
 		self._difficulty = difficultly
 		self._description = description
 		self._best_times = []
+		self._id = id
+		self._path = path # folder with walls.txt and times.txt
+		self._is_challenge = is_challenge
+		self._color = color # of its play button
 
+	def get_id(self) -> int:
+		return self._id
+	def set_id(self, id: int) -> None:
+		self._id = id
+	def get_path(self) -> str:
+		return self._path
+	def set_path(self, path: str) -> None:
+		self._path = path
+	def get_is_challenge(self) -> bool:
+		return self._is_challenge
+	def set_is_challenge(self, is_challenge: bool) -> None:
+		self._is_challenge = is_challenge
+	def get_color(self) -> str:
+		return self._color
+	def set_color(self, color: str) -> None:
+		self._color = color
 
 	def get_name(self) -> str:
 		return self._name
@@ -611,9 +1659,3 @@ class Map():
 		return self._description
 	def set_description(self, description: str) -> None:
 		self._description = description
-	def get_vert_offset(self) -> float:
-		return self._vert_offset
-	def set_vert_offset(self, vert_offset: float) -> None:
-		self._vert_offset = vert_offset
-	def add_vert_offset(self, vert_offset: float) -> None:
-		self._vert_offset += vert_offset
@@ -0,0 +1,88 @@
+from __future__ import annotations # for type hints
+import sys
+import time
+
+from classes import User, Player, Surface, Checkpoints, WallGrid, Camera, Inputs
+from maps import load_map
+
+class Engine(): # eng
+	# the game without a window: load a map, step it with Inputs and read the player back
+	def __init__(self, map: int, user: User = None):
+		self._map = map
+		self._user = user if user is not None else User()
+		self.reset()
+
+	def reset(self) -> None:
+		self._walls, self._checkpoints, self._wall_grid = load_map(self._map)
+		self._player = Player(self._user)
+		self._camera = Camera()
+		self._time = 0
+		self._ticks = 0
+
+	def get_map(self) -> int:
+		return self._map
+	def get_user(self) -> User:
+		return self._user
+	def get_player(self) -> Player:
+		return self._player
+	def get_walls(self) -> list[Surface]:
+		return self._walls
+	def get_checkpoints(self) -> Checkpoints:
+		return self._checkpoints
+	def get_wall_grid(self) -> WallGrid:
+		return self._wall_grid
+	def get_camera(self) -> Camera:
+		return self._camera
+	def get_time(self) -> float:
+		return self._time
+	def get_ticks(self) -> int:
+		return self._ticks
+	def get_is_done(self) -> bool:
+		return not self._player.get_is_alive() or self._player.get_is_finished()
+
+	def step(self, inputs: Inputs, delta: float) -> None:
+		# like the game screen: nothing moves once the player has died or finished
+		if self.get_is_done():
+			return
+		self._player.update(inputs, delta, self._wall_grid, self._checkpoints, self._camera)
+		self._time += delta
+		self._ticks += 1
+
+	def get_state(self) -> dict:
+		p = self._player
+		checkpoint = None
+		if self._checkpoints.get_furthest() is not None:
+			checkpoint = self._checkpoints.get_furthest().get_num()
+		return {
+			"x": p.get_pt().get_x(),
+			"y": p.get_pt().get_y(),
+			"vx": p.get_vec_move().get_x(),
+			"vy": p.get_vec_move().get_y(),
+			"w": p.get_w(),
+			"h": p.get_h(),
+			"is_grounded": p.get_is_grounded(),
+			"is_sliding": p.get_is_sliding(),
+			"is_alive": p.get_is_alive(),
+			"is_finished": p.get_is_finished(),
+			"checkpoint": checkpoint,
+			"time": self._time,
+			"ticks": self._ticks,
+		}
+
+def main():
+	# python engine.py [map] [ticks]: hold right and jump for a while and report the speed
+	map = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+	ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+	engine = Engine(map)
+	inputs = Inputs(walk_right=True, jump=True)
+	start = time.perf_counter()
+	for i in range(ticks):
+		engine.step(inputs, 1 / 120)
+		if engine.get_is_done():
+			engine.reset()
+	taken = time.perf_counter() - start
+	print(engine.get_state())
+	print("%d ticks in %.3fs (%.0f ticks/s)" % (ticks, taken, ticks / taken))
+
+if __name__ == "__main__":
+	main()
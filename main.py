@@ -2,28 +2,107 @@ from __future__ import annotations # for type hints
 import pygame # graphics library
 from pygame.locals import * # for keyboard input (ex: 'K_w')
 import time # for fps/delta
+launch_time = time.perf_counter() # for the time to first frame
 import datetime # for timer
 import sys
-
-from classes import DownPress, Vector, Hitbox, HitboxPart, AdvancedHitbox, User, Player, Surface, Teleporter, Button, ToggleButton, Map
-
-def create_window() -> pygame.Surface:
-	pygame.init()
-	win = pygame.display.set_mode((1920, 1080), pygame.SCALED | pygame.FULLSCREEN)
+import os
+import warnings
+
+from classes import DownPress, InputBuffer, Vector, Hitbox, HitboxPart, AdvancedHitbox, User, Player, Surface, Teleporter, Checkpoints, Inputs, WallGrid, Camera, LevelSnapshot, TileCache, Overlay, FixedTimestep, FrameScheduler, Screen, ScreenMachine, Button, ToggleButton, Map, text_cache, frame_profiler
+from maps import get_path, load_times, format_time, load_map, get_map, get_maps, get_has_next_challenge, preload_maps
+from replay import Replay, make_replay_path
+
+FIXED_TIMESTEP = True # False feeds the raw frame time into the physics like before
+TICK_RATE = int(sys.argv[sys.argv.index("--tick-rate") + 1]) if "--tick-rate" in sys.argv else 120 # physics ticks per second, fast moves are cut into steps so a lower rate can't pass through walls
+MAX_TICKS_PER_FRAME = 8 # ticks one frame may run to catch up before the game slows down instead
+JUMP_BUFFER = .1 # seconds a jump pressed too early, like just before landing, still happens once it can
+RECORD_REPLAYS = True # finished runs are saved to map_data/<map>/replays
+PROFILER_KEY = K_F3 # shows the frame time breakdown
+PROFILER_DUMP_KEY = K_F4 # writes the last frames to profile_<date>.csv
+TILE_CACHE = True # False draws every wall on screen each frame instead of blitting cached strips
+UNCAPPED = "--uncapped" in sys.argv # run every screen as fast as possible, for benchmarking
+GAME_FPS = 0 # 0 leaves gameplay to vsync, which holds it to the display's refresh rate
+NO_VSYNC_FPS = 144 # gameplay rate when GAME_FPS is 0 and the display can't vsync
+MENU_FPS = 30
+FONT_NAME = "calibri"
+FONT_CACHE = "fontPath.txt" # where the font found on the first launch is kept, empty for pygame's own font
+MENU_SCREENS = ["welcome", "selection", "challenge", "finished", "dead", "pause", "settings", "settings_game", "selc_leaderboard", "leaderboard", "mechanics"]
+
+def create_window() -> tuple[pygame.Surface, bool]:
+	# only what the game uses, pygame.init() would also start sound and joysticks
+	# also returns whether flip waits for the display, pygame can't say its refresh rate but it can vsync
+	pygame.display.init()
+	pygame.font.init()
+	with warnings.catch_warnings(record=True) as caught:
+		warnings.simplefilter("always")
+		try:
+			win = pygame.display.set_mode((1920, 1080), pygame.SCALED | pygame.FULLSCREEN, vsync=1)
+			# without a renderer pygame falls back to a plain window and only warns
+			is_vsync = len(caught) == 0
+		except pygame.error:
+			win = pygame.display.set_mode((1920, 1080), pygame.SCALED | pygame.FULLSCREEN)
+			is_vsync = False
 	pygame.display.set_caption("TempName: v-0.94")
 	pygame.mouse.set_cursor(*pygame.cursors.tri_left)
-	return win
+	return win, is_vsync
 	# s.set_alpha(128)                # alpha level
 	# s.fill((255,255,255))           # this fills the entire surface
 	# windowSurface.blit(s, (0,0))    # (0,0) are the top-left coordinates
 
+def create_scheduler(is_vsync: bool) -> FrameScheduler:
+	# with vsync flip already waits for the display, so gameplay isn't held back a second time
+	if GAME_FPS > 0:
+		scheduler = FrameScheduler(GAME_FPS)
+	elif is_vsync:
+		scheduler = FrameScheduler(0)
+	else:
+		scheduler = FrameScheduler(NO_VSYNC_FPS)
+	if UNCAPPED:
+		scheduler.set_fps(0)
+	else:
+		for screen in MENU_SCREENS:
+			scheduler.set_policy(screen, MENU_FPS)
+	return scheduler
+
+def load_font_path() -> str:
+	# finding calibri means asking fontconfig for every installed font, so the answer is kept between launches
+	f_name = get_path(FONT_CACHE)
+	if os.path.exists(f_name):
+		f = open(f_name, "r")
+		path = f.read().strip()
+		f.close()
+		if path == "" or os.path.exists(path):
+			return path
+	path = pygame.font.match_font(FONT_NAME)
+	if path is None:
+		path = "" # pygame's own font
+	try:
+		f = open(f_name, "w")
+		f.write(path + "\n")
+		f.close()
+	except OSError:
+		pass
+	return path
+
+_fonts: dict[int, pygame.Font] = {}
+_font_path: str = None
+
+def get_font(size: int) -> pygame.Font:
+	# one Font per size for the whole run
+	global _font_path
+	if size not in _fonts:
+		if _font_path is None:
+			_font_path = load_font_path()
+		_fonts[size] = pygame.font.Font(_font_path if _font_path != "" else None, size)
+	return _fonts[size]
+
 def create_fonts() -> list[pygame.Font]:
 	fonts = []
-	font_1 = pygame.font.SysFont('calibri', 80)
+	font_1 = get_font(80)
 	# font_1.set_bold(True)
-	font_2 = pygame.font.SysFont('calibri', 50)
+	font_2 = get_font(50)
 	# font_2.set_bold(True)
-	font_3 = pygame.font.SysFont('calibri', 60)
+	font_3 = get_font(60)
 	# font_3.set_bold(True)
 	fonts.append(font_1)
 	fonts.append(font_2)
@@ -31,15 +110,22 @@ def create_fonts() -> list[pygame.Font]:
 
 	return fonts
 
-def handle_events(user) -> None:
+def handle_events(user, input_buffer: InputBuffer = None) -> bool:
+	# returns whether the window has to be drawn again, like after being covered up
+	is_exposed = False
 	for event in pygame.event.get():
+		if input_buffer is not None and input_buffer.handle_event(event):
+			continue
 		if event.type == pygame.QUIT:
 			save_user(user)
 			pygame.quit()
 			sys.exit()
 			quit()
+		elif event.type == pygame.VIDEOEXPOSE or event.type == pygame.WINDOWEXPOSED:
+			is_exposed = True
+	return is_exposed
 
-def handle_keys(screen: str, player: Player, hb_mouse, delta: float, walls, teleporters, elapsed_time, times, current_map, deaths, keys_down, escape_down) -> str:
+def handle_keys(screen: str, player: Player, hb_mouse, delta: float, timestep: FixedTimestep, wall_grid, checkpoints, camera, elapsed_time, times, current_map, deaths, keys_down, escape_down, replay: Replay = None, input_buffer: InputBuffer = None) -> str:
 	if (keys_down[K_RCTRL] or keys_down[K_LCTRL]) and keys_down[K_q]:
 		pygame.quit()
 		sys.exit()
@@ -71,20 +157,34 @@ def handle_keys(screen: str, player: Player, hb_mouse, delta: float, walls, tele
 		deaths[0] += 1
 		return "dead"
 	elif screen == "game":
-		player.handle_keys(keys_down, hb_mouse, delta, walls, teleporters)
-		if player.get_is_finished():
-			if len(times) > 0 and str(elapsed_time) < times[len(times) - 1]:
-				pos = 0
-				for i in range(len(times)):
-					if str(elapsed_time) <= times[i]:
-						pos = i
-						break
-				times.insert(pos, str(elapsed_time))
-				if len(times) > 10:
-					times.pop()
+		if FIXED_TIMESTEP:
+			ticks = timestep.add_time(delta)
+			delta = timestep.get_tick()
+		else:
+			ticks = 1
+		for tick in range(ticks):
+			# each tick gets the key events that came before it instead of whatever is down when the frame starts
+			if input_buffer is not None:
+				inputs = input_buffer.next_tick(delta)
 			else:
-				times = [elapsed_time]
-			save_times(times, str(current_map))
+				inputs = Inputs.from_keys(keys_down, player.user)
+			player.save_prev_pt()
+			camera.save_prev_vert_offset()
+			frame_profiler.begin("physics")
+			player.update(inputs, delta, wall_grid, checkpoints, camera)
+			frame_profiler.end("physics")
+			if input_buffer is not None and player.get_has_jumped():
+				input_buffer.consume("jump")
+			if replay is not None:
+				replay.record(inputs, delta, player, camera)
+			if not player.get_is_alive() or player.get_is_finished():
+				break
+		if player.get_is_finished():
+			if times is not None:
+				# the simulated time of every life, so it can be checked against the replay
+				times.add(checkpoints.get_time())
+			if replay is not None and RECORD_REPLAYS:
+				replay.save(make_replay_path(current_map))
 			return "finished"
 	elif screen == "dead" and keys_down[K_RETURN]:
 		return "respawn"
@@ -192,7 +292,7 @@ def handle_inputs(win, font, input_rects, actives, user_texts, input_colors, col
 def draw_welcome(win: pygame.Surface, font: pygame.font, hb_mouse: Hitbox, buttons: list[Button]) -> None:
 	# 60 font
 	win.fill("#6fcae8")
-	surf_text = font.render("WHAT GOES UP...", True, "#ffffff")
+	surf_text = text_cache.render(font, "WHAT GOES UP...", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 100))
 	for button in buttons:
 		button.draw(win)
@@ -201,7 +301,7 @@ def draw_welcome(win: pygame.Surface, font: pygame.font, hb_mouse: Hitbox, butto
 def draw_selection(win: pygame.Surface, font: pygame.font, hb_mouse: Hitbox, buttons: list[Button]) -> None:
 	# 60 font
 	win.fill("#6fcae8")
-	surf_text = font.render("MAP SELECTION", True, "#ffffff")
+	surf_text = text_cache.render(font, "MAP SELECTION", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 200))
 
 	for button in buttons:
@@ -210,70 +310,81 @@ def draw_selection(win: pygame.Surface, font: pygame.font, hb_mouse: Hitbox, but
 
 def draw_challenge(win: pygame.Surface, font: pygame.font, hb_mouse: Hitbox, buttons: list[Button]) -> None:
 	win.fill("#6fcae8")
-	surf_text = font.render("CHALLENGES", True, "#ffffff")
+	surf_text = text_cache.render(font, "CHALLENGES", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 200))
 
 	for button in buttons:
 		button.draw(win)
 
-def draw_game(win: pygame.Surface, font: pygame.font, player: Player, walls: list[Surface], hb_mouse: Hitbox, delta: float, elapsed_time: time) -> None:
-	# 30 font
+def draw_walls(win: pygame.Surface, tile_cache: TileCache, vert_offset: float) -> int:
+	# returns how many blits or rects it took
+	if TILE_CACHE:
+		return tile_cache.draw(win, vert_offset)
 	win.fill("#fdf6e3")
-	# use pygame.Surface.scroll for when background is an image
+	# only the walls inside the window get drawn
+	walls = tile_cache.get_wall_grid().query(0, vert_offset, win.get_width(), vert_offset + win.get_height())
 	for wall in walls:
 		# print(wall)
-		wall.draw(win)
-	player.draw(win)
+		wall.draw(win, vert_offset)
+	return len(walls)
+
+def draw_game(win: pygame.Surface, font: pygame.font, player: Player, tile_cache: TileCache, camera: Camera, hb_mouse: Hitbox, delta: float, elapsed_time: time, alpha: float = 1) -> None:
+	# 30 font
+	# use pygame.Surface.scroll for when background is an image
+	vert_offset = camera.get_lerp_vert_offset(alpha)
+	draws = draw_walls(win, tile_cache, vert_offset)
+	player.draw(win, vert_offset, alpha)
+	draws += 1
 
 	# Elapsed time
-	surf_time_text = font.render("Time: " + str(elapsed_time), True, "#ffffff")
+	# labels come from the text cache and the changing numbers from the glyph atlas instead of rendering the strings every frame
+	atlas = text_cache.get_atlas(font, "#ffffff")
+	time_text = str(elapsed_time)
 	fps = 1/delta
-	surf_fps_text = font.render("FPS: %4.0f" % fps, True, "#ffffff")
-	height = surf_time_text.get_height() + surf_fps_text.get_height() + 40
-	font_rect = (0, 0, surf_time_text.get_width() + win.get_width() * .075, height)
+	lines = [("Time: ", time_text), ("FPS: ", "%4.0f" % fps), ("Draws: ", "%d" % draws)]
+	surf_time_text = text_cache.render(font, lines[0][0], "#ffffff")
+	height = atlas.get_height() * len(lines) + 40
+	font_rect = (0, 0, surf_time_text.get_width() + atlas.calc_width(time_text) + win.get_width() * .075, height)
 	pygame.draw.rect(win, "#000000", font_rect)
-	win.blit(surf_time_text, ((win.get_width() * 0.0375, 10)))
-	win.blit(surf_fps_text, ((win.get_width() * 0.0375, 50)))
+	for i in range(len(lines)):
+		surf_text = text_cache.render(font, lines[i][0], "#ffffff")
+		x = win.get_width() * 0.0375
+		y = 10 + 40 * i
+		win.blit(surf_text, (x, y))
+		atlas.draw(win, lines[i][1], x + surf_text.get_width(), y)
 
 
 	# hb_mouse.draw(win)
 
-def draw_dead(win: pygame.Surface, font: pygame.font, player: Player, walls: list[Surface], hb_mouse: Hitbox, delta: float, buttons: list[Button], deaths) -> None:
+def draw_overlay(win: pygame.Surface, player: Player, tile_cache: TileCache, camera: Camera, overlay: Overlay) -> None:
+	# the level only gets drawn and dimmed on the first frame, after that it is one blit
+	if not overlay.get_is_valid():
+		# use pygame.Surface.scroll for when background is an image
+		draw_walls(win, tile_cache, camera.get_vert_offset())
+		player.draw(win, camera.get_vert_offset())
+		overlay.capture(win)
+	overlay.draw(win)
+
+def draw_dead(win: pygame.Surface, font: pygame.font, player: Player, tile_cache: TileCache, camera: Camera, hb_mouse: Hitbox, delta: float, buttons: list[Button], deaths, overlay: Overlay) -> None:
 	# 60 font
-	win.fill("#fdf6e3")
-	# use pygame.Surface.scroll for when background is an image
-	for wall in walls:
-		wall.draw(win)
-	player.draw(win)
+	draw_overlay(win, player, tile_cache, camera, overlay)
 
 	# hb_mouse.draw(win)
-	# Work on making it opaque when player dies. Or just add a different screen. The rest of the code works though?
-	rect = pygame.Surface((win.get_width(), win.get_height()), pygame.SRCALPHA)
-	rect.fill((0,0,0, 128))           # this fills the entire surface
-	win.blit(rect, (0,0))    # (0,0) are the top-left coordinates
-	surf_text = font.render("YOU HAVE DIED", True, "#ffffff")
+	surf_text = text_cache.render(font, "YOU HAVE DIED", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 100))
 	text = "Deaths: %i" % deaths[0]
-	surf_text = font.render(text, True, "#ffffff")
+	surf_text = text_cache.render(font, text, "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 300))
 	for button in buttons:
 		button.draw(win)
 	# hb_mouse.draw(win)
 
-def draw_pause(win: pygame.Surface, font: pygame.font, player: Player, walls: list[Surface], hb_mouse: Hitbox, delta: float, buttons: list[Button]) -> None:
+def draw_pause(win: pygame.Surface, font: pygame.font, player: Player, tile_cache: TileCache, camera: Camera, hb_mouse: Hitbox, delta: float, buttons: list[Button], overlay: Overlay) -> None:
 	# 60 font
-	win.fill("#fdf6e3")
-	# use pygame.Surface.scroll for when background is an image
-	for wall in walls:
-		wall.draw(win)
-	player.draw(win)
+	draw_overlay(win, player, tile_cache, camera, overlay)
 
 	# hb_mouse.draw(win)
-	# Work on making it opaque when player dies. Or just add a different screen. The rest of the code works though?
-	rect = pygame.Surface((win.get_width(), win.get_height()), pygame.SRCALPHA)
-	rect.fill((0,0,0, 128))           # this fills the entire surface
-	win.blit(rect, (0,0))    # (0,0) are the top-left coordinates
-	surf_text = font.render("OPTIONS", True, "#ffffff")
+	surf_text = text_cache.render(font, "OPTIONS", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 100))
 	for button in buttons:
 		button.draw(win)
@@ -283,9 +394,9 @@ def draw_finished(win: pygame.Surface, font: pygame.font, player: Player, walls:
 	# 60 font
 	# win.fill("#3973fa")
 	win.fill("#6fcae8")
-	surf_text = font.render("YOU FINISHED", True, "#ffffff")
+	surf_text = text_cache.render(font, "YOU FINISHED", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 100))
-	surf_text = font.render("Time Taken:", True, "#ffffff")
+	surf_text = text_cache.render(font, "Time Taken:", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 200))
 
 	times = str(elapsed_time).split(":")
@@ -295,7 +406,7 @@ def draw_finished(win: pygame.Surface, font: pygame.font, player: Player, walls:
 		time = str(times[1]) + ":" + str(times[2]) + " minutes"
 	else:
 		time = str(times[2]) + " seconds"
-	surf_text = font.render(time, True, "#ffffff")
+	surf_text = text_cache.render(font, time, "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 300))
 	for button in buttons:
 		button.draw(win)
@@ -303,11 +414,11 @@ def draw_finished(win: pygame.Surface, font: pygame.font, player: Player, walls:
 
 def draw_selc_leaderboard(win, font, buttons):
 	win.fill("#6fcae8")
-	surf_text = font.render("LEADERBOARDS", True, "#ffffff")
+	surf_text = text_cache.render(font, "LEADERBOARDS", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 100))
-	surf_text = font.render("CHALLENGES", True, "#ffffff")
+	surf_text = text_cache.render(font, "CHALLENGES", "#ffffff")
 	win.blit(surf_text, (win.get_width() / 20, 250))
-	surf_text = font.render("MAPS", True, "#ffffff")
+	surf_text = text_cache.render(font, "MAPS", "#ffffff")
 	win.blit(surf_text, (win.get_width() / 2, 250))
 
 	for button in buttons:
@@ -315,18 +426,19 @@ def draw_selc_leaderboard(win, font, buttons):
 
 def draw_leaderboard(win, fonts, times, name, buttons):
 	win.fill("#6fcae8")
-	surf_text = fonts[0].render(name, True, "#ffffff")
+	surf_text = text_cache.render(fonts[0], name, "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 100))
 
-	for i in range(len(times)):
-		surf_text = fonts[1].render("%d) %s" % (i + 1, times[i]), True, "#ffffff")
+	top = times.get_top() if times is not None else []
+	for i in range(len(top)):
+		surf_text = text_cache.render(fonts[1], "%d) %s" % (i + 1, format_time(top[i])), "#ffffff")
 		win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 200 + ((surf_text.get_height() + 30) * i)))
 	for button in buttons:
  		button.draw(win)
 
 def draw_mechanics(win, fonts, buttons, user):
 	win.fill("#6fcae8")
-	surf_text = fonts[0].render("CONTROLS", True, "#ffffff")
+	surf_text = text_cache.render(fonts[0], "CONTROLS", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 100))
 
 	l1 = "Walk Right: %s" % pygame.key.name(user.settings[0])
@@ -334,15 +446,15 @@ def draw_mechanics(win, fonts, buttons, user):
 	l3 = "Jump: %s" % pygame.key.name(user.settings[2])
 	l4 = "Slide: %s" % pygame.key.name(user.settings[3])
 	l5 = "Super Jumping: %s + %s" % (pygame.key.name(user.settings[3]), pygame.key.name(user.settings[2]))
-	surf_text = fonts[2].render(l1, True, "#ffffff")
+	surf_text = text_cache.render(fonts[2], l1, "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 225))
-	surf_text = fonts[2].render(l2, True, "#ffffff")
+	surf_text = text_cache.render(fonts[2], l2, "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 325))
-	surf_text = fonts[2].render(l3, True, "#ffffff")
+	surf_text = text_cache.render(fonts[2], l3, "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 425))
-	surf_text = fonts[2].render(l4, True, "#ffffff")
+	surf_text = text_cache.render(fonts[2], l4, "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 525))
-	surf_text = fonts[2].render(l5, True, "#ffffff")
+	surf_text = text_cache.render(fonts[2], l5, "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 625))
 
 	for button in buttons:
@@ -350,160 +462,23 @@ def draw_mechanics(win, fonts, buttons, user):
 
 def draw_settings(win: pygame.Surface, fonts: pygame.font, player: Player, buttons, input_rects, user_texts, input_colors, texts):
 	win.fill("#6fcae8")
-	surf_text = fonts[0].render("SETTINGS", True, "#ffffff")
+	surf_text = text_cache.render(fonts[0], "SETTINGS", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 100))
-	surf_text = fonts[1].render("press enter to confirm key change", True, "#ffffff")
+	surf_text = text_cache.render(fonts[1], "press enter to confirm key change", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 900))
-	surf_text = fonts[1].render("not all keys allowed as inputs", True, "#ffffff")
+	surf_text = text_cache.render(fonts[1], "not all keys allowed as inputs", "#ffffff")
 	win.blit(surf_text, ((win.get_width() - surf_text.get_width())/2, 1000))
 	for i in range(len(input_rects)):
 		user_text = user_texts[i]
 		color = input_colors[i]
 		input_rect = input_rects[i]
-		text_surface = fonts[2].render(user_text, True, "#ffffff")
+		text_surface = text_cache.render(fonts[2], user_text, "#ffffff")
 		input_rect.draw(win)
 		win.blit(text_surface, (input_rect._pt._x + (input_rect._w / 2) - (text_surface.get_width() / 2), input_rect._pt._y + (input_rect._h / 2) - (text_surface.get_height() / 2)))
 		win.blit(texts[i], ((win.get_width() / 2) - (texts[1].get_width() / 2) - (texts[i].get_width() / 2) - 10, input_rect._pt._y + (input_rect._h / 2) - (texts[i].get_height() / 2)))
 	for button in buttons:
 		button.draw(win)
 
-def save_map(walls: list[Surface], f_name) -> None:
-	f = open(f_name, "w")
-	for wall in walls:
-		if wall.get_is_teleport():
-			pos = "{},{},{},{},{},{},{}\n"
-			f.write(pos.format(int(wall.get_is_teleport()), wall.get_pt().get_x(), wall.get_pt().get_y(), wall.get_w(), wall.get_h(), float(wall.get_friction()), wall.get_num()))
-		else:
-			pos = "{},{},{},{},{},{},{},{}\n"
-			f.write(pos.format(int(wall.get_is_teleport()), wall.get_pt().get_x(), wall.get_pt().get_y(), wall.get_w(), wall.get_h(), float(wall.get_friction()), int(wall.get_can_kill()), int(wall.get_is_finish())))
-	f.close()
-
-def save_times(times, map) -> None:
-	if map == "0":
-		f = open("map_data/map_1/times.txt", 'w')
-	elif map == "1":
-		f = open("map_data/ch1/times.txt", 'w')
-	elif map == "2":
-		f = open("map_data/ch2/times.txt", 'w')
-	elif map == "3":
-		f = open("map_data/ch3/times.txt", 'w')
-	elif map == "4":
-		f = open("map_data/ch4/times.txt", 'w')
-	elif map == "5":
-		f = open("map_data/ch5/times.txt", 'w')
-	elif map == "6":
-		f = open("map_data/ch6/times.txt", 'w')
-	elif map == "7":
-		f = open("map_data/ch7/times.txt", 'w')
-	elif map == "8":
-		f = open("map_data/map_2/times.txt", 'w')
-	else:
-		f = []
-	if f != []:
-		for time in times:
-			f.write(str(time) + "\n")
-		f.close()
-
-def load_times(map) -> None:
-	times = []
-	if map == "0":
-		f = open("map_data/map_1/times.txt", 'r')
-	elif map == "1":
-		f = open("map_data/ch1/times.txt", 'r')
-	elif map == "2":
-		f = open("map_data/ch2/times.txt", 'r')
-	elif map == "3":
-		f = open("map_data/ch3/times.txt", 'r')
-	elif map == "4":
-		f = open("map_data/ch4/times.txt", 'r')
-	elif map == "5":
-		f = open("map_data/ch5/times.txt", 'r')
-	elif map == "6":
-		f = open("map_data/ch6/times.txt", 'r')
-	elif map == "7":
-		f = open("map_data/ch7/times.txt", 'r')
-	elif map == "8":
-		f = open("map_data/map_2/times.txt", 'r')
-	else:
-		f = []
-
-	if f != []:
-		for line in f:
-			line = line.strip()
-			times.append(line)
-		f.close()
-	return times
-
-def load_map(map: int) -> list[Surface]:
-	walls = []
-	getting_times = False
-	if str(map) == "0":
-		f = open("map_data/map_1/walls.txt", 'r')
-	elif str(map) == "1":
-		f = open("map_data/ch1/walls.txt", 'r')
-	elif str(map) == "2":
-		f = open("map_data/ch2/walls.txt", 'r')
-	elif str(map) == "3":
-		f = open("map_data/ch3/walls.txt", 'r')
-	elif str(map) == "4":
-		f = open("map_data/ch4/walls.txt", 'r')
-	elif str(map) == "5":
-		f = open("map_data/ch5/walls.txt", 'r')
-	elif str(map) == "6":
-		f = open("map_data/ch6/walls.txt", 'r')
-	elif str(map) == "7":
-		f = open("map_data/ch7/walls.txt", 'r')
-	elif str(map) == "8":
-		f = open("map_data/map_2/walls.txt", 'r')
-	else:
-		f = []
-
-	for line in f:
-		line = line.strip()
-		stats = line.split(",")
-		# print(stats[5], stats[6])
-		# print(stats[5] == 1)
-		if int(stats[0]) == 1:
-			# print(stats[6])
-			wall = Teleporter(Vector(int(stats[1]), int(stats[2])), int(stats[3]), int(stats[4]), None, int(stats[6]), float(stats[5]))
-			# print(wall.get_num())
-		else:
-			if float(stats[5]) == 0:
-				color = "#8df6ec"
-				kill = False
-				end = False
-			elif float(stats[5]) > 0:
-				color = "#22ab7d"
-				kill = False
-				end = False
-			elif int(stats[6]) == 1:
-				# print("aaaaaa")
-				color = "#ff0000"
-				kill = True
-				end = False
-			elif int(stats[7]) == 1:
-				# print("bbbbbb")
-				color = "#999900"
-				kill = False
-				end = True
-			else:
-				# print("ccccc")
-				color = "#000000"
-				kill = False
-				end = False
-			wall = Surface(Vector(int(stats[1]), int(stats[2])), int(stats[3]), int(stats[4]), float(stats[5]), color, kill, end, False)
-		# print(wall.get_can_kill(), wall.get_is_finish())
-		walls.append(wall)
-	if f != []:
-		f.close()
-	teleporters = []
-	for wall in walls:
-		if wall.get_is_teleport():
-			wall.set_next_tp(wall)
-			teleporters.append(wall)
-	# print(teleporters)
-	return walls, teleporters
-
 def save_user(user):
 	f = open("userSettings.txt", 'w')
 	for setting in user.settings:
@@ -533,109 +508,172 @@ def load_user():
 	# print(user.settings, user.music_on)
 	return user
 
-def create_buttons(win: pygame.Surface, font: pygame.font, user):
-	# 40 font
-	surf_text = font.render("PLAY", True, "#000000")
-	play_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.35), surf_text.get_width(), surf_text.get_height(), "PLAY", False, "selection", font)
-	surf_text = font.render("LEADERBOARDS", True, "#000000")
-	leaderboard_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.5), surf_text.get_width(), surf_text.get_height(), "LEADERBOARDS", False, "selc_leaderboard", font)
-	surf_text = font.render("SETTINGS", True, "#000000")
-	settings_button_1 = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.8), surf_text.get_width(), surf_text.get_height(), "SETTINGS", False, "settings", font)
-	surf_text = font.render("CONTROLS", True, "#000000")
-	mechanics_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.65), surf_text.get_width(), surf_text.get_height(), "CONTROLS", False, "mechanics", font)
-	surf_text = font.render("PLAY AGAIN", True, "#000000")
-	dead_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 500), surf_text.get_width(), surf_text.get_height(), "PLAY AGAIN", False, "respawn", font, "#ffffff")
-	f_play_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * .35), surf_text.get_width(), surf_text.get_height(), "PLAY AGAIN", False, "respawn", font)
-	surf_text = font.render("BACK TO MAIN MENU", True, "#000000")
-	menu_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.6), surf_text.get_width(), surf_text.get_height(), "BACK TO MAIN MENU", False, "welcome", font)
-	d_menu_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 800), surf_text.get_width(), surf_text.get_height(), "BACK TO MAIN MENU", False, "welcome", font, "#ffffff")
-	surf_text = font.render("RESUME GAME", True, "#000000")
-	return_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 300), surf_text.get_width(), surf_text.get_height(), "RESUME GAME", False, "game", font, "#ffffff")
-	surf_text = font.render("MAIN MENU", True, "#000000")
-	p_menu_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 700), surf_text.get_width(), surf_text.get_height(), "MAIN MENU", False, "welcome", font, "#ffffff")
-	surf_text = font.render("SETTINGS", True, "#000000")
-	settings_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 433.33), surf_text.get_width(), surf_text.get_height(), "SETTINGS", False, "settings_game", font, "#ffffff")
-	surf_text = font.render("RESTART", True, "#000000")
-	restart_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 566.66), surf_text.get_width(), surf_text.get_height(), "RESTART", False, "restart", font, "#ffffff")
-	surf_text = font.render("BACK", True, "#000000")
-	back_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "welcome", font)
-	surf_text = font.render("PLAY TRAINING COURSE", True, "#000000")
-	s_train_button = Button(Vector(win.get_width() / 20, 600), surf_text.get_width(), surf_text.get_height(), "PLAY TRAINING COURSE", False, "0", font, "#f09e24")
-	surf_text = font.render("PLAY ICE PEAK", True, "#000000")
-	s_ice_button = Button(Vector(win.get_width() / 20, s_train_button.get_pt().get_y() + s_train_button.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "PLAY ICE PEAK", False, "8", font, "#f03524")
-	surf_text = font.render("PLAY CHALLENGES", True, "#000000")
-	s_tut_button = Button(Vector(win.get_width() / 20, s_train_button.get_pt().get_y() - 20 - surf_text.get_height()), surf_text.get_width(), surf_text.get_height(), "PLAY CHALLENGES", False, "challenge", font)
-	surf_text = font.render("BACK", True, "#000000")
-	t_back_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "selection", font)
-	surf_text = font.render("PLAY JUMPING CHALLENGE", True, "#000000")
-	t_1 = Button(Vector(win.get_width() / 20, 400), surf_text.get_width(), surf_text.get_height(), "PLAY JUMPING CHALLENGE", False, "1", font, "#127802")
-	surf_text = font.render("PLAY DOUBLE JUMPING CHALLENGE", True, "#000000")
-	t_2 = Button(Vector(win.get_width() / 20, t_1.get_pt().get_y() + t_1.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "PLAY DOUBLE JUMPING CHALLENGE", False, "2", font, "#127802")
-	surf_text = font.render("PLAY SLIDING CHALLENGE", True, "#000000")
-	t_3 = Button(Vector(win.get_width() / 20, t_2.get_pt().get_y() + t_2.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "PLAY SLIDING CHALLENGE", False, "3", font, "#127802")
-	surf_text = font.render("PLAY SLIDING JUMPING CHALLENGE", True, "#000000")
-	t_4 = Button(Vector(win.get_width() / 20, t_3.get_pt().get_y() + t_3.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "PLAY SLIDING JUMPING CHALLENGE", False, "4", font, "#127802")
-	surf_text = font.render("PLAY WALL BOUNCE CHALLENGE", True, "#000000")
-	t_5 = Button(Vector(win.get_width() / 20, t_4.get_pt().get_y() + t_4.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "PLAY WALL BOUNCE CHALLENGE", False, "5", font, "#127802")
-	surf_text = font.render("PLAY DEATH CHALLENGE", True, "#000000")
-	t_6 = Button(Vector(win.get_width() / 20, t_5.get_pt().get_y() + t_5.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "PLAY DEATH CHALLENGE", False, "6", font, "#127802")
-	surf_text = font.render("PLAY ULTIMATE CHALLENGE", True, "#000000")
-	t_7 = Button(Vector(win.get_width() / 20, t_6.get_pt().get_y() + t_6.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "PLAY ULTIMATE CHALLENGE", False, "7", font, "#f09e24")
-	surf_text = font.render("NEXT LEVEL", True, "#000000")
-	continue_button = Button(Vector(win.get_width() / 2 - surf_text.get_width() / 2, win.get_height() * .475), surf_text.get_width(), surf_text.get_height(), "NEXT LEVEL", False, "continue", font)
-	surf_text = font.render("EXIT TO DESKTOP", True, "#000000")
-	p_exit_button = Button(Vector(win.get_width() / 2 - surf_text.get_width() / 2, win.get_height() * .8), surf_text.get_width(), surf_text.get_height(), "EXIT TO DESKTOP", False, "exit", font)
-	exit_button = Button(Vector(win.get_width() - surf_text.get_width(), win.get_height() - surf_text.get_height()), surf_text.get_width(), surf_text.get_height(), "EXIT TO DESKTOP", False, "exit", font)
-
-	surf_text = font.render("JUMPING CHALLENGE", True, "#000000")
-	l_1 = Button(Vector(win.get_width() / 20, 400), surf_text.get_width(), surf_text.get_height(), "JUMPING CHALLENGE", False, "1", font)
-	surf_text = font.render("DOUBLE JUMPING CHALLENGE", True, "#000000")
-	l_2 = Button(Vector(win.get_width() / 20, l_1.get_pt().get_y() + l_1.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "DOUBLE JUMPING CHALLENGE", False, "2", font)
-	surf_text = font.render("SLIDING CHALLENGE", True, "#000000")
-	l_3 = Button(Vector(win.get_width() / 20, l_2.get_pt().get_y() + l_2.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "SLIDING CHALLENGE", False, "3", font)
-	surf_text = font.render("SLIDING JUMPING CHALLENGE", True, "#000000")
-	l_4 = Button(Vector(win.get_width() / 20, l_3.get_pt().get_y() + l_3.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "SLIDING JUMPING CHALLENGE", False, "4", font)
-	surf_text = font.render("WALL BOUNCE CHALLENGE", True, "#000000")
-	l_5 = Button(Vector(win.get_width() / 20, l_4.get_pt().get_y() + l_4.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "WALL BOUNCE CHALLENGE", False, "5", font)
-	surf_text = font.render("DEATH CHALLENGE", True, "#000000")
-	l_6 = Button(Vector(win.get_width() / 20, l_5.get_pt().get_y() + l_5.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "DEATH CHALLENGE", False, "6", font)
-	surf_text = font.render("ULTIMATE CHALLENGE", True, "#000000")
-	l_7 = Button(Vector(win.get_width() / 20, l_6.get_pt().get_y() + l_6.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "ULTIMATE CHALLENGE", False, "7", font)
-	surf_text = font.render("TRAINING COURSE", True, "#000000")
-	l_0 = Button(Vector(win.get_width() / 2, 400), surf_text.get_width(), surf_text.get_height(), "TRAINING COURSE", False, "0", font)
-	surf_text = font.render("ICE PEAK", True, "#000000")
-	l_8 = Button(Vector(win.get_width() / 2, l_0.get_pt().get_y() + l_0.get_h() + 20), surf_text.get_width(), surf_text.get_height(), "ICE PEAK", False, "8", font)
-
-	surf_text = font.render("BACK", True, "#000000")
-	l_back_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "selc_leaderboard", font)
-	surf_text = font.render("BACK", True, "#000000")
-	selc_l_back_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "welcome", font)
-
-	surf_text = font.render("MUSIC ON/OFF", True, "#000000")
-	if user.music_on:
-		color = "#12d932"
-	else:
-		color = "#ff0000"
-	music_button = ToggleButton(Vector(win.get_width() / 2 - surf_text.get_width() / 2, win.get_height() * .7), surf_text.get_width(), surf_text.get_height(), "MUSIC ON/OFF", user, user.music_on, False, "settings", font, color)
-
-	surf_text = font.render("BACK", True, "#000000")
-	back_game_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "pause", font)
-
-	welc_buttons = [play_button, leaderboard_button, exit_button, mechanics_button, settings_button_1]
-	selc_buttons = [back_button, s_train_button, s_ice_button, s_tut_button, exit_button]
-	challenge_buttons = [t_back_button, t_1, t_2, t_3, t_4, t_5, t_6, t_7, exit_button]
-	challenge_fin_buttons = [f_play_button, menu_button, continue_button, p_exit_button]
-	fin_buttons = [f_play_button, menu_button, p_exit_button]
-	dead_buttons = [dead_button, d_menu_button, p_exit_button]
-	pause_buttons = [return_button, p_menu_button, settings_button, p_exit_button, restart_button]
-	selc_leaderboard_buttons = [selc_l_back_button, l_1, l_2, l_3, l_4, l_5, l_6, l_7, l_0, l_8, exit_button]
-	leaderboard_buttons = [l_back_button, exit_button]
-	controls_buttons = [back_button, exit_button]
-	settings_buttons = [back_button, exit_button, music_button]
-	settings_game_buttons = [back_game_button, exit_button, music_button]
-	buttons = []
-
-	return buttons, welc_buttons, selc_buttons, challenge_buttons, challenge_fin_buttons, fin_buttons, dead_buttons, pause_buttons, selc_leaderboard_buttons, leaderboard_buttons, controls_buttons, settings_buttons, settings_game_buttons
+class ButtonSets(): # bs
+	# the buttons of each screen, made the first time that screen is shown instead of all at startup
+	def __init__(self, win: pygame.Surface, font: pygame.font, user):
+		# 40 font
+		self._win = win
+		self._font = font
+		self._user = user
+		self._sets: dict[str, list[Button]] = {}
+		self._shared: dict[str, Button] = {} # buttons on more than one screen
+		self._creates = {
+			"welc": self.create_welc,
+			"selc": self.create_selc,
+			"challenge": self.create_challenge,
+			"challenge_fin": self.create_challenge_fin,
+			"fin": self.create_fin,
+			"dead": self.create_dead,
+			"pause": self.create_pause,
+			"selc_leaderboard": self.create_selc_leaderboard,
+			"leaderboard": self.create_leaderboard,
+			"controls": self.create_controls,
+			"settings": self.create_settings,
+			"settings_game": self.create_settings_game,
+		}
+
+	def get(self, name: str) -> list[Button]:
+		if name not in self._sets:
+			self._sets[name] = self._creates[name]()
+		return self._sets[name]
+
+	def count_sets(self) -> int:
+		return len(self._sets)
+
+	def get_shared(self, name: str) -> Button:
+		if name not in self._shared:
+			win = self._win
+			font = self._font
+			if name == "exit":
+				surf_text = font.render("EXIT TO DESKTOP", True, "#000000")
+				button = Button(Vector(win.get_width() - surf_text.get_width(), win.get_height() - surf_text.get_height()), surf_text.get_width(), surf_text.get_height(), "EXIT TO DESKTOP", False, "exit", font)
+			elif name == "p_exit":
+				surf_text = font.render("EXIT TO DESKTOP", True, "#000000")
+				button = Button(Vector(win.get_width() / 2 - surf_text.get_width() / 2, win.get_height() * .8), surf_text.get_width(), surf_text.get_height(), "EXIT TO DESKTOP", False, "exit", font)
+			elif name == "back":
+				surf_text = font.render("BACK", True, "#000000")
+				button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "welcome", font)
+			elif name == "f_play":
+				surf_text = font.render("PLAY AGAIN", True, "#000000")
+				button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * .35), surf_text.get_width(), surf_text.get_height(), "PLAY AGAIN", False, "respawn", font)
+			elif name == "menu":
+				surf_text = font.render("BACK TO MAIN MENU", True, "#000000")
+				button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.6), surf_text.get_width(), surf_text.get_height(), "BACK TO MAIN MENU", False, "welcome", font)
+			elif name == "music":
+				surf_text = font.render("MUSIC ON/OFF", True, "#000000")
+				if self._user.music_on:
+					color = "#12d932"
+				else:
+					color = "#ff0000"
+				button = ToggleButton(Vector(win.get_width() / 2 - surf_text.get_width() / 2, win.get_height() * .7), surf_text.get_width(), surf_text.get_height(), "MUSIC ON/OFF", self._user, self._user.music_on, False, "settings", font, color)
+			self._shared[name] = button
+		return self._shared[name]
+
+	def create_welc(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		surf_text = font.render("PLAY", True, "#000000")
+		play_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.35), surf_text.get_width(), surf_text.get_height(), "PLAY", False, "selection", font)
+		surf_text = font.render("LEADERBOARDS", True, "#000000")
+		leaderboard_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.5), surf_text.get_width(), surf_text.get_height(), "LEADERBOARDS", False, "selc_leaderboard", font)
+		surf_text = font.render("SETTINGS", True, "#000000")
+		settings_button_1 = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.8), surf_text.get_width(), surf_text.get_height(), "SETTINGS", False, "settings", font)
+		surf_text = font.render("CONTROLS", True, "#000000")
+		mechanics_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, win.get_height() * 0.65), surf_text.get_width(), surf_text.get_height(), "CONTROLS", False, "mechanics", font)
+		return [play_button, leaderboard_button, self.get_shared("exit"), mechanics_button, settings_button_1]
+
+	def create_map_column(self, is_challenge: bool, x: float, y: float, prefix: str = "", is_colored: bool = True) -> list[Button]:
+		# one button per registered map of the kind, stacked down from y
+		font = self._font
+		buttons = []
+		for id, map in get_maps().items():
+			if map.get_is_challenge() != is_challenge:
+				continue
+			text = prefix + map.get_name().upper()
+			surf_text = font.render(text, True, "#000000")
+			if is_colored:
+				button = Button(Vector(x, y), surf_text.get_width(), surf_text.get_height(), text, False, str(id), font, map.get_color())
+			else:
+				button = Button(Vector(x, y), surf_text.get_width(), surf_text.get_height(), text, False, str(id), font)
+			y += button.get_h() + 20
+			buttons.append(button)
+		return buttons
+
+	def create_selc(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		map_buttons = self.create_map_column(False, win.get_width() / 20, 600, "PLAY ")
+		surf_text = font.render("PLAY CHALLENGES", True, "#000000")
+		s_tut_button = Button(Vector(win.get_width() / 20, 600 - 20 - surf_text.get_height()), surf_text.get_width(), surf_text.get_height(), "PLAY CHALLENGES", False, "challenge", font)
+		return [self.get_shared("back")] + map_buttons + [s_tut_button, self.get_shared("exit")]
+
+	def create_challenge(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		surf_text = font.render("BACK", True, "#000000")
+		t_back_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "selection", font)
+		return [t_back_button] + self.create_map_column(True, win.get_width() / 20, 400, "PLAY ") + [self.get_shared("exit")]
+
+	def create_challenge_fin(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		surf_text = font.render("NEXT LEVEL", True, "#000000")
+		continue_button = Button(Vector(win.get_width() / 2 - surf_text.get_width() / 2, win.get_height() * .475), surf_text.get_width(), surf_text.get_height(), "NEXT LEVEL", False, "continue", font)
+		return [self.get_shared("f_play"), self.get_shared("menu"), continue_button, self.get_shared("p_exit")]
+
+	def create_fin(self) -> list[Button]:
+		return [self.get_shared("f_play"), self.get_shared("menu"), self.get_shared("p_exit")]
+
+	def create_dead(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		surf_text = font.render("PLAY AGAIN", True, "#000000")
+		dead_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 500), surf_text.get_width(), surf_text.get_height(), "PLAY AGAIN", False, "respawn", font, "#ffffff")
+		surf_text = font.render("BACK TO MAIN MENU", True, "#000000")
+		d_menu_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 800), surf_text.get_width(), surf_text.get_height(), "BACK TO MAIN MENU", False, "welcome", font, "#ffffff")
+		return [dead_button, d_menu_button, self.get_shared("p_exit")]
+
+	def create_pause(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		surf_text = font.render("RESUME GAME", True, "#000000")
+		return_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 300), surf_text.get_width(), surf_text.get_height(), "RESUME GAME", False, "game", font, "#ffffff")
+		surf_text = font.render("MAIN MENU", True, "#000000")
+		p_menu_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 700), surf_text.get_width(), surf_text.get_height(), "MAIN MENU", False, "welcome", font, "#ffffff")
+		surf_text = font.render("SETTINGS", True, "#000000")
+		settings_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 433.33), surf_text.get_width(), surf_text.get_height(), "SETTINGS", False, "settings_game", font, "#ffffff")
+		surf_text = font.render("RESTART", True, "#000000")
+		restart_button = Button(Vector(win.get_width() / 2 - surf_text.get_width()/2, 566.66), surf_text.get_width(), surf_text.get_height(), "RESTART", False, "restart", font, "#ffffff")
+		return [return_button, p_menu_button, settings_button, self.get_shared("p_exit"), restart_button]
+
+	def create_selc_leaderboard(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		challenge_buttons = self.create_map_column(True, win.get_width() / 20, 400, is_colored = False)
+		map_buttons = self.create_map_column(False, win.get_width() / 2, 400, is_colored = False)
+		surf_text = font.render("BACK", True, "#000000")
+		selc_l_back_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "welcome", font)
+		return [selc_l_back_button] + challenge_buttons + map_buttons + [self.get_shared("exit")]
+
+	def create_leaderboard(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		surf_text = font.render("BACK", True, "#000000")
+		l_back_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "selc_leaderboard", font)
+		return [l_back_button, self.get_shared("exit")]
+
+	def create_controls(self) -> list[Button]:
+		return [self.get_shared("back"), self.get_shared("exit")]
+
+	def create_settings(self) -> list[Button]:
+		return [self.get_shared("back"), self.get_shared("exit"), self.get_shared("music")]
+
+	def create_settings_game(self) -> list[Button]:
+		win = self._win
+		font = self._font
+		surf_text = font.render("BACK", True, "#000000")
+		back_game_button = Button(Vector(win.get_width() / 20, win.get_height() * 0.05), surf_text.get_width(), surf_text.get_height(), "BACK", False, "pause", font)
+		return [back_game_button, self.get_shared("exit"), self.get_shared("music")]
 
 def load_level(level: int) -> list[Surface]:
 	if level == 0:
@@ -650,9 +688,8 @@ def load_level(level: int) -> list[Surface]:
 		teleporters = []
 		for wall in walls:
 			if wall.get_is_teleport():
-				wall.set_next_tp(wall)
 				teleporters.append(wall)
-		return walls, teleporters
+		return walls, Checkpoints(teleporters)
 	else:
 		return [], []
 
@@ -660,17 +697,19 @@ def main():
 	# maps = ["map_data/ch1/walls.txt", "map_data/ch2/walls.txt", "map_data/ch3/walls.txt", "map_data/ch4/walls.txt", "map_data/ch5/walls.txt", "map_data/ch6/walls.txt", "map_data/ch7/walls.txt", "map_data/map_1/walls.txt", "map_data/map_2/walls.txt"]
 	# for i in range(len(maps)):
 	delta = 0.017 # second since last frame
-	last_frame = time.time()
 
 	screen = "welcome"
 	previous_screen = "welcome"
 	game_status = True
 
+	timestep = FixedTimestep(TICK_RATE, MAX_TICKS_PER_FRAME)
 	# clock = pygame.time.Clock()
 	start_time = datetime.datetime.now()
 
-	win = create_window()
+	win, is_vsync = create_window()
+	preload_maps()
 	fonts = create_fonts()
+	scheduler = create_scheduler(is_vsync)
 
 	# print(K_LCTRL)
 
@@ -678,13 +717,21 @@ def main():
 	user = load_user()
 	# user = User()
 	# save_user(user)
-	player = Player(user)
+	player = Player(user, frame_profiler)
+	camera = Camera()
 	# walls = load_map(0)
 	walls = []
-	teleporters = []
-	times = []
+	checkpoints = Checkpoints([])
+	wall_grid = WallGrid(walls)
+	tile_cache = TileCache(wall_grid, checkpoints, win.get_width())
+	overlay = Overlay()
+	start_snapshot = LevelSnapshot(checkpoints, camera)
+	checkpoint_snapshot = LevelSnapshot(checkpoints, camera)
+	times = None
+	replay = None
 	hb_mouse = Hitbox(Vector(pygame.mouse.get_pos()[0] - 5, pygame.mouse.get_pos()[1] - 5), 10, 10, "#ff00ff")
-	buttons, welc_buttons, selc_buttons, challenge_buttons, challenge_fin_buttons, fin_buttons, dead_buttons, pause_buttons, selc_leaderboard_buttons, leaderboard_buttons, control_buttons, settings_buttons, settings_game_buttons = create_buttons(win, fonts[2], user)
+	button_sets = ButtonSets(win, fonts[2], user)
+	is_first_frame = True
 	current_map = 0
 	was_down = False
 	map_name = ""
@@ -692,7 +739,11 @@ def main():
 	elapsed_time = start_time
 	deaths = [0]
 
+	input_buffer = InputBuffer(user, {"jump": JUMP_BUFFER})
 	escape_down = DownPress()
+	profiler_down = DownPress()
+	profiler_dump_down = DownPress()
+	show_profiler = False
 
 	# Text input stuff
 	user_texts = ['', '', '', '']
@@ -708,10 +759,38 @@ def main():
 	setting_texts = [fonts[2].render("WALK LEFT", True, "#ffffff"), fonts[2].render("WALK RIGHT", True, "#ffffff"), fonts[2].render("JUMP", True, "#ffffff"), fonts[2].render("SLIDE", True, "#ffffff")]
 	extra_keys = [K_LALT, K_LALT, K_LCTRL, K_RCTRL, K_LSHIFT, K_RSHIFT, K_UP, K_DOWN, K_LEFT, K_RIGHT, K_SCROLLOCK, K_CAPSLOCK, K_NUMLOCK, K_F15, K_F14, K_F13, K_F12, K_F11, K_F10, K_F9, K_F8, K_F7, K_F6, K_F5, K_F4, K_F3, K_F2, K_F1,]
 
+	# the hooks read main's variables when they run, so they always see the current player, map and so on
+	def get_finished_buttons():
+		if in_challenge and get_has_next_challenge(current_map):
+			return button_sets.get("challenge_fin")
+		return button_sets.get("fin")
+	def get_input_parts():
+		# a whole row, the key name can be wider than its box
+		return [((user_texts[i], input_rects[i].get_color()), pygame.Rect(0, input_rects[i].get_pt().get_y(), win.get_width(), input_rects[i].get_h())) for i in range(len(input_rects))]
+	screens = ScreenMachine([
+		Screen("game", draw=lambda: draw_game(win, fonts[1], player, tile_cache, camera, hb_mouse, delta, elapsed_time, timestep.get_alpha() if FIXED_TIMESTEP else 1)),
+		Screen("welcome", lambda: button_sets.get("welc"), draw=lambda: draw_welcome(win, fonts[0], hb_mouse, button_sets.get("welc")), is_static=True),
+		Screen("selection", lambda: button_sets.get("selc"), draw=lambda: draw_selection(win, fonts[0], hb_mouse, button_sets.get("selc")), is_static=True),
+		Screen("challenge", lambda: button_sets.get("challenge"), draw=lambda: draw_challenge(win, fonts[0], hb_mouse, button_sets.get("challenge")), is_static=True),
+		# the next pause or death captures a fresh frame
+		Screen("dead", lambda: button_sets.get("dead"), draw=lambda: draw_dead(win, fonts[0], player, tile_cache, camera, hb_mouse, delta, button_sets.get("dead"), deaths, overlay), exit=overlay.invalidate, is_static=True),
+		Screen("pause", lambda: button_sets.get("pause"), draw=lambda: draw_pause(win, fonts[0], player, tile_cache, camera, hb_mouse, delta, button_sets.get("pause"), overlay), exit=overlay.invalidate, is_static=True),
+		Screen("settings", lambda: button_sets.get("settings"), update=lambda: handle_inputs(win, fonts[2], input_rects, actives, user_texts, input_colors, color_passive, color_active, user, hb_mouse, was_down, keys, mouse_buttons_down, extra_keys), draw=lambda: draw_settings(win, fonts, player, button_sets.get("settings"), input_rects, user_texts, input_colors, setting_texts), parts=get_input_parts, is_static=True),
+		Screen("settings_game", lambda: button_sets.get("settings_game"), update=lambda: handle_inputs(win, fonts[2], input_rects, actives, user_texts, input_colors, color_passive, color_active, user, hb_mouse, was_down, keys, mouse_buttons_down, extra_keys), draw=lambda: draw_settings(win, fonts, player, button_sets.get("settings_game"), input_rects, user_texts, input_colors, setting_texts), parts=get_input_parts, is_static=True),
+		Screen("finished", get_finished_buttons, draw=lambda: draw_finished(win, fonts[0], player, walls, hb_mouse, delta, get_finished_buttons(), elapsed_time), is_static=True),
+		Screen("leaderboard", lambda: button_sets.get("leaderboard"), draw=lambda: draw_leaderboard(win, fonts, times, map_name, button_sets.get("leaderboard")), is_static=True),
+		Screen("selc_leaderboard", lambda: button_sets.get("selc_leaderboard"), draw=lambda: draw_selc_leaderboard(win, fonts[0], button_sets.get("selc_leaderboard")), is_static=True),
+		Screen("mechanics", lambda: button_sets.get("controls"), draw=lambda: draw_mechanics(win, fonts, button_sets.get("controls"), user), is_static=True),
+	])
+	screens.switch(screen)
+
 	while game_status:
-		delta = time.time() - last_frame
-		last_frame = time.time()
-		handle_events(user)
+		delta = scheduler.start_frame()
+		frame_profiler.begin("frame")
+		frame_profiler.begin("events")
+		if handle_events(user, input_buffer):
+			screens.invalidate()
+		frame_profiler.end("events")
 		# print(tes)
 		keys = pygame.key.get_pressed()
 		# print(keys, "aaaaaaaaaaaaaaa")
@@ -719,40 +798,23 @@ def main():
 		# 	# print(keys_down[i])
 		# 	if keys[i] == 1:
 		# 		print(i, "AAAAAAAAAAA")
-		screen = handle_keys(screen, player, hb_mouse, delta, walls, teleporters, elapsed_time, times, current_map, deaths, keys, escape_down)
+		if profiler_down.down(keys[PROFILER_KEY]):
+			show_profiler = not show_profiler
+			screens.invalidate()
+		if profiler_dump_down.down(keys[PROFILER_DUMP_KEY]):
+			frame_profiler.dump_csv(get_path("profile_%s.csv" % datetime.datetime.now().strftime("%Y%m%d_%H%M%S")))
+		frame_profiler.begin("keys")
+		screen = handle_keys(screen, player, hb_mouse, delta, timestep, wall_grid, checkpoints, camera, elapsed_time, times, current_map, deaths, keys, escape_down, replay, input_buffer)
+		if screen != "game":
+			input_buffer.flush()
+		frame_profiler.end("keys")
+		frame_profiler.begin("mouse")
 		mouse_buttons_down = pygame.mouse.get_pressed()
 		# print(screen)
-		if screen == "welcome":
-			screen, was_down = handle_mouse(screen, hb_mouse, welc_buttons, was_down, mouse_buttons_down)
-		elif screen == "selection":
-			screen, was_down = handle_mouse(screen, hb_mouse, selc_buttons, was_down, mouse_buttons_down)
-		elif screen == "challenge":
-			screen, was_down = handle_mouse(screen, hb_mouse, challenge_buttons, was_down, mouse_buttons_down)
-			# print(screen)
-		elif screen == "finished":
-			if in_challenge and current_map != 7:
-				f_buttons = challenge_fin_buttons
-			else:
-				f_buttons = fin_buttons
-			screen, was_down = handle_mouse(screen, hb_mouse, f_buttons, was_down, mouse_buttons_down)
-		elif screen == "dead":
-			screen, was_down = handle_mouse(screen, hb_mouse, dead_buttons, was_down, mouse_buttons_down)
-		elif screen == "pause":
-			screen, was_down = handle_mouse(screen, hb_mouse, pause_buttons, was_down, mouse_buttons_down)
-		elif screen == "settings":
-			handle_inputs(win, fonts[2], input_rects, actives, user_texts, input_colors, color_passive, color_active, user, hb_mouse, was_down, keys, mouse_buttons_down, extra_keys)
-			screen, was_down = handle_mouse(screen, hb_mouse, settings_buttons, was_down, mouse_buttons_down)
-		elif screen == "settings_game":
-			handle_inputs(win, fonts[2], input_rects, actives, user_texts, input_colors, color_passive, color_active, user, hb_mouse, was_down, keys, mouse_buttons_down, extra_keys)
-			screen, was_down = handle_mouse(screen, hb_mouse, settings_game_buttons, was_down, mouse_buttons_down)
-		elif screen == "selc_leaderboard":
-			screen, was_down = handle_mouse(screen, hb_mouse, selc_leaderboard_buttons, was_down, mouse_buttons_down)
-		elif screen == "leaderboard":
-			screen, was_down = handle_mouse(screen, hb_mouse, leaderboard_buttons, was_down, mouse_buttons_down)
-		elif screen == "mechanics":
-			screen, was_down = handle_mouse(screen, hb_mouse, control_buttons, was_down, mouse_buttons_down)
-		else:
-			screen, was_down = handle_mouse(screen, hb_mouse, buttons, was_down, mouse_buttons_down)
+		screens.update(screen)
+		screen, was_down = handle_mouse(screen, hb_mouse, screens.get_buttons(screen), was_down, mouse_buttons_down)
+
+		frame_profiler.end("mouse")
 
 		if len(screen.split(":")) > 1:
 			screen = screen.split(":")
@@ -760,45 +822,38 @@ def main():
 			screen = "leaderboard"
 			times = load_times(current_map)
 			# print(current_map + " aaaaaaaaaaaaaa")
-			if current_map == "0":
-				map_name = "Training Course"
-			elif current_map == "1":
-				map_name = "Jumping Challenge"
-			elif current_map == "2":
-				map_name = "Double Jumping Challenge"
-			elif current_map == "3":
-				map_name = "Sliding Challenge"
-			elif current_map == "4":
-				map_name = "Slide Jumping Challenge"
-			elif current_map == "5":
-				map_name = "Wall Bounce Challenge"
-			elif current_map == "6":
-				map_name = "Death Challenge"
-			elif current_map == "7":
-				map_name = "Ultimate Challenge"
-			elif current_map == "8":
-				map_name = "ICE PEAK"
+			if get_map(current_map) is not None:
+				map_name = get_map(current_map).get_name()
 			else:
 				screen = "selc_leaderboard"
 		else:
-			if "0" <= screen <= "8":
+			if screen.isdigit() and get_map(screen) is not None:
 				start_time = datetime.datetime.now()
 				current_map = int(screen)
-				walls, teleporters = load_map(current_map)
+				walls, checkpoints, wall_grid = load_map(current_map)
+				tile_cache = TileCache(wall_grid, checkpoints, win.get_width())
 				times = load_times(str(current_map))
-				player = Player(user)
+				player = Player(user, frame_profiler)
+				timestep.reset()
+				camera = Camera()
+				start_snapshot = LevelSnapshot(checkpoints, camera)
+				checkpoint_snapshot = LevelSnapshot(checkpoints, camera)
+				replay = Replay(current_map)
 				screen = "game"
-				if 1 <= current_map <= 7:
-					in_challenge = True
-				else:
-					in_challenge = False
+				in_challenge = get_map(current_map).get_is_challenge()
 				deaths[0] = 0
 			elif screen == "continue":
 				start_time = datetime.datetime.now()
 				current_map += 1
-				walls, teleporters = load_map(current_map)
+				walls, checkpoints, wall_grid = load_map(current_map)
+				tile_cache = TileCache(wall_grid, checkpoints, win.get_width())
 				times = load_times(str(current_map))
-				player = Player(user)
+				player = Player(user, frame_profiler)
+				timestep.reset()
+				camera = Camera()
+				start_snapshot = LevelSnapshot(checkpoints, camera)
+				checkpoint_snapshot = LevelSnapshot(checkpoints, camera)
+				replay = Replay(current_map)
 				screen = "game"
 				in_challenge = True
 				deaths[0] = 0
@@ -807,71 +862,63 @@ def main():
 			if player.get_is_finished() or screen == "restart":
 				start_time = datetime.datetime.now()
 				deaths[0] = 0
-				player = Player(user)
-				active_tps = []
+				player = Player(user, frame_profiler)
+				timestep.reset()
+				camera = Camera()
+				start_snapshot.restore(camera)
+				checkpoints.set_time(0)
+				checkpoint_snapshot = LevelSnapshot(checkpoints, camera)
+				replay = Replay(current_map)
 			else:
-				player = Player(user)
-				active_tps = []
-				if teleporters != []:
-					next_tp = teleporters[0].get_next_tp()
-					for tp in teleporters:
-						if tp.get_is_active():
-							active_tps.append(tp.get_num())
-
-			walls, teleporters = load_map(current_map)
-			for i in active_tps:
-				teleporters[i].set_is_active(True)
-				# print(next_tp)
-				# if teleporters[i] == next_tp:
-				# 	print("same")
-				teleporters[i].set_next_tp(teleporters[active_tps[len(active_tps) - 1]])
+				player = Player(user, frame_profiler)
+				timestep.reset()
+				camera = Camera()
+				# back at the start with every teleporter reached so far still active
+				checkpoint_snapshot.restore(camera)
+				if replay is not None:
+					replay.add_respawn()
 			screen = "game"
+		elif screen == "game" and not checkpoint_snapshot.get_is_current(checkpoints):
+			checkpoint_snapshot.capture_checkpoints(checkpoints)
 
-		if screen == "game":
-			elapsed_time = datetime.datetime.now() - start_time
-			# print(datetime.datetime.now())
-			# print(win)
-			draw_game(win, fonts[1], player, walls, hb_mouse, delta, elapsed_time)
-			# print(elapsed_time)
-		elif screen == "welcome":
-			draw_welcome(win, fonts[0], hb_mouse, welc_buttons)
-		elif screen == "selection":
-			draw_selection(win, fonts[0], hb_mouse, selc_buttons)
-		elif screen == "challenge":
-			draw_challenge(win, fonts[0], hb_mouse, challenge_buttons)
-		elif screen == "dead":
-			start_time = datetime.datetime.now() - elapsed_time
-			draw_dead(win, fonts[0], player, walls, hb_mouse, delta, dead_buttons, deaths)
-		elif screen == "pause":
-			start_time = datetime.datetime.now() - elapsed_time
-			draw_pause(win, fonts[0], player, walls, hb_mouse, delta, pause_buttons)
-		elif screen == "settings":
-			draw_settings(win, fonts, player, settings_buttons, input_rects, user_texts, input_colors, setting_texts)
-		elif screen == "settings_game":
-			draw_settings(win, fonts, player, settings_game_buttons, input_rects, user_texts, input_colors, setting_texts)
-		elif screen == "finished":
-			if in_challenge and current_map != 7:
-				f_buttons = challenge_fin_buttons
-			else:
-				f_buttons = fin_buttons
-			draw_finished(win, fonts[0], player, walls, hb_mouse, delta, f_buttons, elapsed_time)
-		elif screen == "leaderboard":
-			draw_leaderboard(win, fonts, times, map_name, leaderboard_buttons)
-		elif screen == "selc_leaderboard":
-			draw_selc_leaderboard(win, fonts[0], selc_leaderboard_buttons)
-		elif screen == "mechanics":
-			draw_mechanics(win, fonts, control_buttons, user)
 		if screen == "exit":
 			save_user(user)
 			pygame.quit()
 			sys.exit()
 			quit()
-		pygame.display.flip()
+		if screen == "game":
+			elapsed_time = datetime.datetime.now() - start_time
+		elif screen == "finished":
+			# the same time that went on the leaderboard
+			elapsed_time = datetime.timedelta(seconds=checkpoints.get_time())
+		elif screen == "dead" or screen == "pause":
+			start_time = datetime.datetime.now() - elapsed_time
+
+		frame_profiler.begin("draw")
+		screens.switch(screen)
+		if show_profiler:
+			# drawn over the screen every frame
+			screens.invalidate()
+		screens.draw()
+		frame_profiler.end("draw")
+		if show_profiler:
+			frame_profiler.draw(win, fonts[1], "frame", 1 / scheduler.get_policy(screen) if scheduler.get_policy(screen) > 0 else 1 / 60)
+		frame_profiler.begin("flip")
+		screens.present()
+		frame_profiler.end("flip")
+		if is_first_frame:
+			print("first frame after %.3fs" % (time.perf_counter() - launch_time))
+			is_first_frame = False
 		# print(user.settings)
 
-		# clock.tick_busy_loop(200)
+		frame_profiler.begin("wait")
+		scheduler.wait(screen)
+		frame_profiler.end("wait")
+		frame_profiler.end("frame")
+		frame_profiler.end_frame()
 
 		# print("Delta: %1.3f\tFPS: %4.2f" % (delta, 1/delta))
 
 
-main()
+if __name__ == "__main__":
+	main()
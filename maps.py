@@ -0,0 +1,331 @@
+from __future__ import annotations # for type hints
+import os
+import sys
+import struct
+import hashlib
+import threading
+import bisect
+import datetime
+
+from classes import Vector, Surface, Teleporter, Checkpoints, WallGrid, Map
+
+def get_path(path: str) -> str:
+	# map files live next to this file, so this works from any working directory
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+def save_map(walls: list[Surface], f_name) -> None:
+	f = open(f_name, "w")
+	for wall in walls:
+		if wall.get_is_teleport():
+			pos = "{},{},{},{},{},{},{}\n"
+			f.write(pos.format(int(wall.get_is_teleport()), wall.get_pt().get_x(), wall.get_pt().get_y(), wall.get_w(), wall.get_h(), float(wall.get_friction()), wall.get_num()))
+		else:
+			pos = "{},{},{},{},{},{},{},{}\n"
+			f.write(pos.format(int(wall.get_is_teleport()), wall.get_pt().get_x(), wall.get_pt().get_y(), wall.get_w(), wall.get_h(), float(wall.get_friction()), int(wall.get_can_kill()), int(wall.get_is_finish())))
+	f.close()
+
+def parse_time(text: str) -> float:
+	# seconds, or the h:mm:ss.ffffff that str(timedelta) used to write
+	parts = text.split(":")
+	seconds = 0.0
+	for part in parts:
+		seconds = seconds * 60 + float(part)
+	return seconds
+
+def format_time(seconds: float) -> str:
+	return str(datetime.timedelta(seconds=seconds))
+
+class Leaderboard(): # lb
+	# every finished run of a map, appended to times.log and folded into times.txt once the log gets long
+	def __init__(self, map_dir: str, top_n: int = 10, compact_every: int = 64):
+		self._map_dir: str = map_dir
+		self._top_n: int = top_n
+		self._compact_every: int = compact_every
+		self._history: list[float] = [] # in the order they were run
+		self._top: list[float] = [] # fastest first, at most top_n
+		self._journal_count: int = 0
+		self.load()
+
+	def get_map_dir(self) -> str:
+		return self._map_dir
+	def get_top_n(self) -> int:
+		return self._top_n
+	def get_top(self) -> list[float]:
+		return self._top
+	def get_history(self) -> list[float]:
+		return self._history
+	def get_journal_count(self) -> int:
+		return self._journal_count
+
+	def get_base_path(self) -> str:
+		return os.path.join(self._map_dir, "times.txt")
+	def get_journal_path(self) -> str:
+		return os.path.join(self._map_dir, "times.log")
+
+	def read_times(self, f_name: str) -> list[float]:
+		times = []
+		if os.path.exists(f_name):
+			f = open(f_name, "r")
+			for line in f:
+				line = line.strip()
+				if line != "":
+					times.append(parse_time(line))
+			f.close()
+		return times
+
+	def load(self) -> None:
+		journal = self.read_times(self.get_journal_path())
+		self._history = self.read_times(self.get_base_path()) + journal
+		self._journal_count = len(journal)
+		self._top = sorted(self._history)[:self._top_n]
+
+	def add(self, seconds: float) -> int:
+		# returns the place the run got on the leaderboard, or -1 if it didn't make it
+		f = open(self.get_journal_path(), "a")
+		f.write("%.6f\n" % seconds)
+		f.close()
+		self._history.append(seconds)
+		self._journal_count += 1
+		rank = -1
+		if len(self._top) < self._top_n or seconds < self._top[-1]:
+			rank = bisect.bisect_right(self._top, seconds)
+			self._top.insert(rank, seconds)
+			if len(self._top) > self._top_n:
+				self._top.pop()
+		if self._journal_count >= self._compact_every:
+			self.compact()
+		return rank
+
+	def compact(self) -> None:
+		# the whole history goes into times.txt and the log starts again
+		f_name = self.get_base_path() + ".tmp"
+		f = open(f_name, "w")
+		for seconds in self._history:
+			f.write("%.6f\n" % seconds)
+		f.close()
+		os.replace(f_name, self.get_base_path())
+		if os.path.exists(self.get_journal_path()):
+			os.remove(self.get_journal_path())
+		self._journal_count = 0
+
+_leaderboards: dict[int, Leaderboard] = {}
+_leaderboards_lock = threading.Lock()
+
+def load_times(map) -> Leaderboard:
+	# one per map for the whole run, kept up to date by add, so usually the preload thread already read it
+	map_dir = get_map_dir(map)
+	if map_dir is None:
+		return None
+	id = int(map)
+	with _leaderboards_lock:
+		if id not in _leaderboards:
+			_leaderboards[id] = Leaderboard(map_dir)
+		return _leaderboards[id]
+
+MAP_MAGIC = b"WGUM"
+MAP_VERSION = 1
+MAP_HEADER = struct.Struct("<4sI32sI") # magic, version, sha256 of walls.txt, record count
+MAP_RECORD = struct.Struct("<Biiiidii") # is_teleport, x, y, w, h, friction, kill or num, finish
+
+def load_info(map_dir: str) -> Map:
+	# info.txt has one key=value per line
+	info = {}
+	f = open(os.path.join(map_dir, "info.txt"), "r")
+	for line in f:
+		line = line.strip()
+		if "=" in line:
+			key, value = line.split("=", 1)
+			info[key.strip()] = value.strip()
+	f.close()
+	return Map(info.get("name", os.path.basename(map_dir)), info.get("size", ""), info.get("difficulty", ""), info.get("description", ""), int(info["id"]), map_dir, info.get("challenge", "False") == "True", info.get("color", "#ffffff"))
+
+def load_registry() -> dict[int, Map]:
+	# every folder in map_data with an info.txt is a map, so new maps need no code
+	maps = {}
+	root = get_path("map_data")
+	for name in sorted(os.listdir(root)):
+		map_dir = os.path.join(root, name)
+		if os.path.isfile(os.path.join(map_dir, "info.txt")):
+			map = load_info(map_dir)
+			maps[map.get_id()] = map
+	return dict(sorted(maps.items()))
+
+_registry: dict[int, Map] = None
+
+def get_maps() -> dict[int, Map]:
+	global _registry
+	if _registry is None:
+		_registry = load_registry()
+	return _registry
+
+def get_map(map) -> Map:
+	# map can be the id or the id as a string, None if there is no such map
+	try:
+		return get_maps().get(int(map))
+	except ValueError:
+		return None
+
+def get_map_dir(map) -> str:
+	if get_map(map) is None:
+		return None
+	return get_map(map).get_path()
+
+def get_has_next_challenge(map) -> bool:
+	if get_map(map) is None or get_map(int(map) + 1) is None:
+		return False
+	return get_map(map).get_is_challenge() and get_map(int(map) + 1).get_is_challenge()
+
+def parse_map(text: str) -> list[tuple]:
+	# one record per line of walls.txt, teleporters keep their num where walls keep kill
+	records = []
+	for line in text.splitlines():
+		line = line.strip()
+		if line == "":
+			continue
+		stats = line.split(",")
+		if int(stats[0]) == 1:
+			records.append((1, int(stats[1]), int(stats[2]), int(stats[3]), int(stats[4]), float(stats[5]), int(stats[6]), 0))
+		else:
+			records.append((0, int(stats[1]), int(stats[2]), int(stats[3]), int(stats[4]), float(stats[5]), int(stats[6]), int(stats[7])))
+	return records
+
+def pack_map(records: list[tuple], digest: bytes) -> bytes:
+	data = bytearray(MAP_HEADER.pack(MAP_MAGIC, MAP_VERSION, digest, len(records)))
+	for record in records:
+		data += MAP_RECORD.pack(*record)
+	return bytes(data)
+
+def unpack_map(data: bytes) -> tuple[bytes, list[tuple]]:
+	# returns the digest of the text it was compiled from and the records, or None if it isn't a compiled map
+	if len(data) < MAP_HEADER.size:
+		return None
+	magic, version, digest, count = MAP_HEADER.unpack_from(data)
+	if magic != MAP_MAGIC or version != MAP_VERSION or len(data) != MAP_HEADER.size + count * MAP_RECORD.size:
+		return None
+	return digest, list(MAP_RECORD.iter_unpack(memoryview(data)[MAP_HEADER.size:]))
+
+def compile_map(f_name: str, bin_name: str) -> list[tuple]:
+	# walls.bin is only trusted while it was built from exactly the walls.txt next to it
+	f = open(f_name, "rb")
+	source = f.read()
+	f.close()
+	digest = hashlib.sha256(source).digest()
+	if os.path.exists(bin_name):
+		f = open(bin_name, "rb")
+		compiled = unpack_map(f.read())
+		f.close()
+		if compiled is not None and compiled[0] == digest:
+			return compiled[1]
+	records = parse_map(source.decode())
+	# written beside it then swapped in, so a reader never sees half a file
+	tmp_name = "%s.%d.tmp" % (bin_name, os.getpid())
+	try:
+		f = open(tmp_name, "wb")
+		f.write(pack_map(records, digest))
+		f.close()
+		os.replace(tmp_name, bin_name)
+	except OSError:
+		# read only install, parse the text every time
+		if os.path.exists(tmp_name):
+			os.remove(tmp_name)
+	return records
+
+def create_wall(record: tuple) -> Surface:
+	is_teleport, x, y, w, h, friction, kill, end = record
+	if is_teleport == 1:
+		return Teleporter(Vector(x, y), w, h, kill, friction)
+	if friction == 0:
+		color = "#8df6ec"
+		kill = False
+		end = False
+	elif friction > 0:
+		color = "#22ab7d"
+		kill = False
+		end = False
+	elif kill == 1:
+		color = "#ff0000"
+		kill = True
+		end = False
+	elif end == 1:
+		color = "#999900"
+		kill = False
+		end = True
+	else:
+		color = "#000000"
+		kill = False
+		end = False
+	return Surface(Vector(x, y), w, h, friction, color, kill, end, False)
+
+def export_map(bin_name: str, f_name: str) -> None:
+	# writes a compiled map back out as walls.txt
+	f = open(bin_name, "rb")
+	compiled = unpack_map(f.read())
+	f.close()
+	if compiled is None:
+		raise ValueError("%s is not a compiled map" % bin_name)
+	save_map([create_wall(record) for record in compiled[1]], f_name)
+
+_records: dict[int, list[tuple]] = {}
+_records_lock = threading.Lock()
+_compile_locks: dict[int, threading.Lock] = {} # one per map, so a map is only compiled by one thread
+
+def get_records(map) -> list[tuple]:
+	# parsed once per run, the preload thread usually got here first
+	id = int(map)
+	with _records_lock:
+		if id in _records:
+			return _records[id]
+		compile_lock = _compile_locks.setdefault(id, threading.Lock())
+	with compile_lock:
+		with _records_lock:
+			if id in _records:
+				return _records[id]
+		map_dir = get_map_dir(id)
+		records = compile_map(os.path.join(map_dir, "walls.txt"), os.path.join(map_dir, "walls.bin"))
+		with _records_lock:
+			_records[id] = records
+	return records
+
+def clear_records(map = None) -> None:
+	# the next load of the map, or of every map, goes back to the disk
+	with _records_lock:
+		if map is None:
+			_records.clear()
+		else:
+			_records.pop(int(map), None)
+
+def preload_maps() -> threading.Thread:
+	# reads every map and its times in the background so starting a level doesn't wait on the disk
+	def preload():
+		for id in get_maps():
+			get_records(id)
+			load_times(id)
+	get_maps()
+	thread = threading.Thread(target=preload, name="preload_maps", daemon=True)
+	thread.start()
+	return thread
+
+def load_map(map: int) -> tuple[list[Surface], Checkpoints, WallGrid]:
+	# the walls are built fresh every time since teleporters change as the level is played
+	walls = []
+	teleporters = []
+	if get_map(map) is not None:
+		for record in get_records(map):
+			wall = create_wall(record)
+			walls.append(wall)
+			if record[0] == 1:
+				teleporters.append(wall)
+	return walls, Checkpoints(teleporters), WallGrid(walls)
+
+def main():
+	# python maps.py: compile every map
+	# python maps.py export <walls.bin> <walls.txt>: turn a compiled map back into text
+	if len(sys.argv) == 4 and sys.argv[1] == "export":
+		export_map(sys.argv[2], sys.argv[3])
+		return
+	for id, map in get_maps().items():
+		records = compile_map(os.path.join(map.get_path(), "walls.txt"), os.path.join(map.get_path(), "walls.bin"))
+		print("%d %s: %d walls" % (id, map.get_name(), len(records)))
+
+if __name__ == "__main__":
+	main()
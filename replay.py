@@ -0,0 +1,185 @@
+from __future__ import annotations # for type hints
+import os
+import sys
+import struct
+import zlib
+import datetime
+
+from classes import User, Player, Camera, Inputs
+from maps import load_map, get_map_dir
+
+REPLAY_MAGIC = b"WGUR"
+REPLAY_VERSION = 2 # 1 had no respawns in it, it reads the same
+REPLAY_HEADER = struct.Struct("<4sIiIIIIdddI") # magic, version, map, checksum_every, checkpoints, runs, checksums, final time, x, y, ticks
+REPLAY_RUN = struct.Struct("<BdI") # input bits, delta, how many ticks in a row
+REPLAY_RESPAWN = 0x80 # a run with these bits is the player respawning, not a tick
+REPLAY_CHECKPOINT = struct.Struct("<I")
+REPLAY_CHECKSUM = struct.Struct("<I")
+STATE = struct.Struct("<ddddddd????")
+
+def calc_checksum(player: Player, camera: Camera) -> int:
+	# crc of everything that would show a desync, packed as floats so it is exact
+	return zlib.crc32(STATE.pack(
+		player.get_pt().get_x(), player.get_pt().get_y(),
+		player.get_vec_move().get_x(), player.get_vec_move().get_y(),
+		player.get_w(), player.get_h(), camera.get_vert_offset(),
+		player.get_is_grounded(), player.get_is_sliding(), player.get_is_alive(), player.get_is_finished()))
+
+class Replay(): # rp
+	# the inputs of a whole run of a map from when it loaded, one run per stretch of ticks with the same inputs and delta
+	# a death and respawn goes in as a run of its own so the time covers every life
+	def __init__(self, map: int, checkpoints: list[int] = None, checksum_every: int = 120):
+		self._map: int = int(map)
+		self._checkpoints: list[int] = checkpoints if checkpoints is not None else [] # teleporters already active at the start
+		self._checksum_every: int = checksum_every
+		self._runs: list[list] = [] # [bits, delta, count]
+		self._checksums: list[int] = [] # after every checksum_every ticks
+		self._ticks: int = 0
+		self._time: float = 0
+		self._final: tuple[float, float] = (0, 0)
+
+	def get_map(self) -> int:
+		return self._map
+	def get_checkpoints(self) -> list[int]:
+		return self._checkpoints
+	def get_checksum_every(self) -> int:
+		return self._checksum_every
+	def get_runs(self) -> list[list]:
+		return self._runs
+	def get_checksums(self) -> list[int]:
+		return self._checksums
+	def get_ticks(self) -> int:
+		return self._ticks
+	def get_time(self) -> float:
+		return self._time
+	def get_final(self) -> tuple[float, float]:
+		return self._final
+
+	def record(self, inputs: Inputs, delta: float, player: Player, camera: Camera) -> None:
+		# call after the tick ran
+		bits = inputs.to_bits()
+		if len(self._runs) > 0 and self._runs[-1][0] == bits and self._runs[-1][1] == delta:
+			self._runs[-1][2] += 1
+		else:
+			self._runs.append([bits, delta, 1])
+		self._ticks += 1
+		self._time += delta
+		self._final = (player.get_pt().get_x(), player.get_pt().get_y())
+		if self._ticks % self._checksum_every == 0:
+			self._checksums.append(calc_checksum(player, camera))
+
+	def add_respawn(self) -> None:
+		self._runs.append([REPLAY_RESPAWN, 0, 1])
+
+	def get_inputs(self):
+		# every tick's inputs and delta in order, None for a respawn
+		for bits, delta, count in self._runs:
+			inputs = Inputs.from_bits(bits) if bits != REPLAY_RESPAWN else None
+			for i in range(count):
+				yield inputs, delta
+
+	def save(self, f_name: str) -> None:
+		data = bytearray(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self._map, self._checksum_every, len(self._checkpoints), len(self._runs), len(self._checksums), self._time, self._final[0], self._final[1], self._ticks))
+		for num in self._checkpoints:
+			data += REPLAY_CHECKPOINT.pack(num)
+		for run in self._runs:
+			data += REPLAY_RUN.pack(*run)
+		for checksum in self._checksums:
+			data += REPLAY_CHECKSUM.pack(checksum)
+		f = open(f_name, "wb")
+		f.write(data)
+		f.close()
+
+	@staticmethod
+	def load(f_name: str) -> Replay:
+		f = open(f_name, "rb")
+		data = f.read()
+		f.close()
+		if len(data) < REPLAY_HEADER.size:
+			raise ValueError("%s is not a replay" % f_name)
+		magic, version, map, checksum_every, checkpoint_count, run_count, checksum_count, time, x, y, ticks = REPLAY_HEADER.unpack_from(data)
+		if magic != REPLAY_MAGIC or version not in (1, REPLAY_VERSION):
+			raise ValueError("%s is not a replay" % f_name)
+		# the counts have to add up to exactly the file, so a cut off or padded one is turned down before anything is read
+		if len(data) != REPLAY_HEADER.size + checkpoint_count * REPLAY_CHECKPOINT.size + run_count * REPLAY_RUN.size + checksum_count * REPLAY_CHECKSUM.size:
+			raise ValueError("%s is cut off or has the wrong counts" % f_name)
+		if checksum_every == 0:
+			raise ValueError("%s has no checksum interval" % f_name)
+		offset = REPLAY_HEADER.size
+		checkpoints = []
+		for i in range(checkpoint_count):
+			checkpoints.append(REPLAY_CHECKPOINT.unpack_from(data, offset)[0])
+			offset += REPLAY_CHECKPOINT.size
+		replay = Replay(map, checkpoints, checksum_every)
+		for i in range(run_count):
+			replay._runs.append(list(REPLAY_RUN.unpack_from(data, offset)))
+			offset += REPLAY_RUN.size
+		for i in range(checksum_count):
+			replay._checksums.append(REPLAY_CHECKSUM.unpack_from(data, offset)[0])
+			offset += REPLAY_CHECKSUM.size
+		replay._time = time
+		replay._final = (x, y)
+		replay._ticks = ticks
+		return replay
+
+def make_replay_path(map: int) -> str:
+	# map_data/<map>/replays/<date and time>.rpl
+	replay_dir = os.path.join(get_map_dir(map), "replays")
+	if not os.path.isdir(replay_dir):
+		os.makedirs(replay_dir)
+	return os.path.join(replay_dir, datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f") + ".rpl")
+
+def play(replay: Replay, user: User = None) -> dict:
+	# runs the replay through Player.handle_keys, stopping at the first checksum that doesn't match
+	# or at a tick after the player died or finished, which main never records
+	walls, checkpoints, wall_grid = load_map(replay.get_map())
+	# only version 1 replays start with teleporters reached, the verifier turns those down
+	checkpoints.set_active_nums(replay.get_checkpoints())
+	player = Player(user if user is not None else User())
+	camera = Camera()
+	ticks = 0
+	time = 0
+	desync = -1
+	overrun = -1
+	checksums = replay.get_checksums()
+	for inputs, delta in replay.get_inputs():
+		if inputs is None:
+			# as main respawns, the teleporters reached so far stay active
+			player = Player(player.user)
+			camera = Camera()
+			continue
+		if not player.get_is_alive() or player.get_is_finished():
+			overrun = ticks
+			break
+		player.save_prev_pt()
+		camera.save_prev_vert_offset()
+		player.handle_keys(inputs.to_keys(player.user), None, delta, wall_grid, checkpoints, camera)
+		ticks += 1
+		time += delta
+		if ticks % replay.get_checksum_every() == 0:
+			i = ticks // replay.get_checksum_every() - 1
+			if i < len(checksums) and checksums[i] != calc_checksum(player, camera):
+				desync = ticks
+				break
+	final = (player.get_pt().get_x(), player.get_pt().get_y())
+	return {
+		"map": replay.get_map(),
+		"ticks": ticks,
+		"time": time,
+		"x": final[0],
+		"y": final[1],
+		"is_alive": player.get_is_alive(),
+		"is_finished": player.get_is_finished(),
+		"desync": desync,
+		"overrun": overrun,
+		"matches": desync == -1 and overrun == -1 and ticks == replay.get_ticks() and time == replay.get_time() and final == replay.get_final(),
+	}
+
+def main():
+	# python replay.py <file.rpl>...: play replays back and check they end where they were recorded
+	for f_name in sys.argv[1:]:
+		result = play(Replay.load(f_name))
+		print(f_name, result)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,111 @@
+from __future__ import annotations # for type hints
+import os
+import sys
+import time
+import struct
+import argparse
+import multiprocessing
+
+from classes import INPUT_FLY
+from replay import Replay, REPLAY_RESPAWN, play
+from maps import get_map
+
+MAX_TICKS = 120 * 60 * 60 # an hour at the default tick rate, longer runs are turned down rather than simulated
+
+def find_replays(path: str) -> list[str]:
+	# a single file or every .rpl under a folder
+	if os.path.isfile(path):
+		return [path]
+	f_names = []
+	for root, dirs, files in os.walk(path):
+		for name in sorted(files):
+			if name.endswith(".rpl"):
+				f_names.append(os.path.join(root, name))
+	return sorted(f_names)
+
+def verify_replay(args: tuple[str, float]) -> dict:
+	# runs in a worker process, so everything it needs comes in and goes out as plain values
+	f_name, tick = args
+	result = {"file": f_name, "accepted": False, "reason": "", "time": 0.0, "ticks": 0}
+	try:
+		replay = Replay.load(f_name)
+	except (OSError, ValueError, IndexError, struct.error) as e:
+		result["reason"] = "unreadable: %s" % e
+		return result
+	if len(replay.get_checkpoints()) > 0:
+		# a run starts when the map loads, so any teleporter it uses has to be reached during it
+		result["reason"] = "starts with teleporters %s already active" % replay.get_checkpoints()
+		return result
+	if get_map(replay.get_map()) is None:
+		result["reason"] = "no map %d" % replay.get_map()
+		return result
+	ticks = 0
+	for bits, delta, count in replay.get_runs():
+		if bits == REPLAY_RESPAWN:
+			continue
+		ticks += count
+		if ticks > MAX_TICKS:
+			result["reason"] = "more than %d ticks" % MAX_TICKS
+			return result
+		if bits & INPUT_FLY:
+			result["reason"] = "fly mode"
+			return result
+		if tick > 0 and delta != tick:
+			result["reason"] = "delta %.6f is not the %.6f tick" % (delta, tick)
+			return result
+	state = play(replay)
+	result["time"] = state["time"]
+	result["ticks"] = state["ticks"]
+	if state["desync"] != -1:
+		result["reason"] = "desync at tick %d" % state["desync"]
+	elif state["overrun"] != -1:
+		result["reason"] = "inputs after the player %s at tick %d" % ("finished" if state["is_alive"] else "died", state["overrun"])
+	elif not state["is_alive"]:
+		result["reason"] = "died"
+	elif not state["is_finished"]:
+		result["reason"] = "did not finish"
+	elif not state["matches"]:
+		result["reason"] = "final state differs from the recording"
+	else:
+		result["accepted"] = True
+	return result
+
+def main():
+	parser = argparse.ArgumentParser(description="re-simulate recorded replays and check they really finished")
+	parser.add_argument("path", help="a replay file or a folder of them")
+	parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to use (default: every core)")
+	parser.add_argument("--tick-rate", type=float, default=120, help="the only delta allowed is 1/tick-rate, 0 allows any")
+	args = parser.parse_args()
+
+	f_names = find_replays(args.path)
+	tick = 1 / args.tick_rate if args.tick_rate > 0 else 0
+	workers = max(1, min(args.workers, len(f_names)))
+	start = time.perf_counter()
+	results = []
+	if workers == 1:
+		for f_name in f_names:
+			results.append(verify_replay((f_name, tick)))
+	else:
+		pool = multiprocessing.Pool(workers)
+		results = pool.map(verify_replay, [(f_name, tick) for f_name in f_names], chunksize=max(1, len(f_names) // (workers * 4)))
+		pool.close()
+		pool.join()
+	taken = time.perf_counter() - start
+
+	accepted = 0
+	ticks = 0
+	for result in results:
+		ticks += result["ticks"]
+		if result["accepted"]:
+			accepted += 1
+			print("ACCEPT %s %.3fs" % (result["file"], result["time"]))
+		else:
+			print("REJECT %s %s" % (result["file"], result["reason"]))
+	print("%d accepted, %d rejected" % (accepted, len(results) - accepted))
+	if taken > 0:
+		print("%d replays (%d ticks) in %.3fs on %d workers: %.1f replays/s, %.0f ticks/s" % (len(results), ticks, taken, workers, len(results) / taken, ticks / taken))
+	if accepted != len(results):
+		sys.exit(1)
+
+if __name__ == "__main__":
+	main()